@@ -0,0 +1,318 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Benchmark of fritzcollectd against simulated routers
+
+    The plugin is loaded into a collectd stand-in and reads routers
+    simulated by a separate process (see simulator.py), so that the CPU time
+    and memory measured are the ones of the plugin. Reported per number of
+    routers:
+
+    - latency: Median and 95th percentile of the read callback duration
+    - calls: SOAP requests per router and read
+    - cpu: CPU time of a read (all routers) in milliseconds
+    - alloc: Peak memory allocated during a read (all routers) in KiB
+
+    Run ``python -m benchmarks.benchmark --help`` for the options. Results
+    can be stored (--json) and compared with a baseline (--compare), the
+    comparison fails if more calls are made or more CPU time is used than
+    the baseline allows.
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import multiprocessing
+import sys
+import time
+import types
+
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from benchmarks.simulator import Router
+
+try:
+    PROCESS_TIME = time.process_time
+except AttributeError:  # Python 2, CPU time on Unix
+    PROCESS_TIME = time.clock  # pylint: disable=no-member
+
+Node = collections.namedtuple('Node', ['key', 'values'])
+
+
+class Config(object):  # pylint: disable=too-few-public-methods
+    """ Module block of the collectd configuration """
+
+    def __init__(self, options):
+        self.children = [Node(key, [value]) for key, value in options.items()]
+
+
+class Values(object):  # pylint: disable=too-few-public-methods
+    """ Stand-in for collectd.Values """
+
+    def __init__(self, collectd, **kwargs):
+        self._collectd = collectd
+        self.__dict__.update(kwargs)
+
+    def dispatch(self, **_):
+        """ Count the dispatched values """
+        self._collectd.dispatched += 1
+
+
+class Collectd(types.ModuleType):
+    """ Stand-in for the collectd module provided by collectd's python
+        plugin: records the callbacks and counts dispatches and warnings """
+
+    def __init__(self):
+        super(Collectd, self).__init__('collectd')
+        self.read_callbacks = []
+        self.dispatched = 0
+        self.warnings = 0
+
+    def register_read(self, callback, interval=None, data=None, name=None):
+        """ Record the read callbacks """
+        # pylint: disable=unused-argument
+        self.read_callbacks.append((callback, data))
+
+    def Values(self, **kwargs):  # pylint: disable=invalid-name
+        """ Create values that can be dispatched """
+        return Values(self, **kwargs)
+
+    def warning(self, _):
+        """ Count warnings and errors """
+        self.warnings += 1
+
+    error = warning
+
+    @staticmethod
+    def register_config(_):
+        """ Callbacks are called by the benchmark """
+
+    register_init = register_shutdown = register_config
+    info = register_config
+
+
+def simulate(connection, count, options):
+    """ Simulator process: serves count routers until told to stop """
+    settings = dict((key, options[key]) for key in [
+        'latency', 'jitter', 'error_rate', 'devices', 'hosts'])
+    routers = [Router(seed=options['seed'] + index, **settings).start()
+               for index in range(count)]
+    connection.send([router.port for router in routers])
+    while connection.recv() == 'requests':
+        connection.send(sum(router.requests for router in routers))
+    for router in routers:
+        router.stop()
+
+
+def percentile(values, percent):
+    """ Percentile (nearest rank) of the values """
+    ordered = sorted(values)
+    return ordered[max(0, int(round(percent / 100.0 * len(ordered))) - 1)]
+
+
+def read_round(collectd, read_threads):
+    """ Call all read callbacks like collectd's read threads do
+
+        Returns the duration of each read callback.
+    """
+    def read(callback_data):
+        callback, data = callback_data
+        start = default_timer()
+        callback(data)
+        return default_timer() - start
+
+    with ThreadPoolExecutor(max_workers=read_threads) as executor:
+        return list(executor.map(read, collectd.read_callbacks))
+
+
+def measure(connection, collectd, args):
+    """ Measure the read latencies, CPU time and the requests of the
+        simulator (connection) during args.reads reads """
+    latencies = []
+    connection.send('requests')
+    requests = connection.recv()
+    cpu = PROCESS_TIME()
+    for _ in range(args.reads):
+        latencies.extend(read_round(collectd, args.read_threads))
+    cpu = PROCESS_TIME() - cpu
+    connection.send('requests')
+    return latencies, cpu, connection.recv() - requests
+
+
+def allocated(collectd, args):
+    """ Peak memory allocated during a read in KiB (None on Python 2) """
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    read_round(collectd, args.read_threads)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024.0
+
+
+def connect(plugin, ports, args):
+    """ Configure and initialize the plugin for the routers on the ports
+
+        Returns the time until all routers are connected.
+    """
+    for index, port in enumerate(ports):
+        options = {'Address': '127.0.0.1', 'Port': port,
+                   'Password': 'benchmark',
+                   'Instance': 'box{}'.format(index)}
+        options.update(args.option)
+        plugin.callback_configure(Config(options))
+    init = default_timer()
+    plugin.callback_init()
+    for router in plugin.CONFIGS:
+        router.wait_connected()
+    return default_timer() - init
+
+
+def benchmark(plugin, collectd, count, args):
+    """ Benchmark the plugin reading count routers """
+    connection, child_connection = multiprocessing.Pipe()
+    simulator = multiprocessing.Process(target=simulate, args=(
+        child_connection, count, vars(args)))
+    simulator.start()
+    try:
+        init = connect(plugin, connection.recv(), args)
+        read_round(collectd, args.read_threads)
+        latencies, cpu, requests = measure(connection, collectd, args)
+        alloc = allocated(collectd, args)
+    finally:
+        plugin.callback_shutdown()
+        del collectd.read_callbacks[:]
+        connection.send('stop')
+        simulator.join()
+    return collections.OrderedDict([
+        ('boxes', count),
+        ('init_s', init),
+        ('latency_ms', 1000 * percentile(latencies, 50)),
+        ('latency_p95_ms', 1000 * percentile(latencies, 95)),
+        ('calls', float(requests) / count / args.reads),
+        ('cpu_ms', 1000 * cpu / args.reads),
+        ('alloc_kib', alloc),
+        ('warnings', collectd.warnings),
+    ])
+
+
+def compare(results, baseline, tolerance):
+    """ Compare the results with a baseline, returns the regressions """
+    regressions = []
+    baseline = dict((result['boxes'], result) for result in baseline)
+    for result in results:
+        base = baseline.get(result['boxes'])
+        if base is None:
+            continue
+        if result['calls'] > base['calls']:
+            regressions.append('{} boxes: {:.1f} calls per read (baseline '
+                               '{:.1f})'.format(result['boxes'],
+                                                result['calls'],
+                                                base['calls']))
+        if result['cpu_ms'] > base['cpu_ms'] * (1 + tolerance):
+            regressions.append('{} boxes: {:.1f} ms CPU per read (baseline '
+                               '{:.1f})'.format(result['boxes'],
+                                                result['cpu_ms'],
+                                                base['cpu_ms']))
+    return regressions
+
+
+def parse_args(argv):
+    """ Parse the command line """
+    parser = argparse.ArgumentParser(
+        description='Benchmark fritzcollectd against simulated routers')
+    parser.add_argument('--boxes', default='1,10,100',
+                        help='comma separated numbers of routers (1-500)')
+    parser.add_argument('--reads', type=int, default=5,
+                        help='measured reads per number of routers')
+    parser.add_argument('--read-threads', type=int, default=5,
+                        help="collectd's ReadThreads")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='response time of the routers in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='maximal deviation of the response time')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='probability of failing SOAP requests')
+    parser.add_argument('--devices', type=int, default=10,
+                        help='DECT devices per router')
+    parser.add_argument('--hosts', type=int, default=50,
+                        help='hosts per router')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the simulated jitter and errors')
+    parser.add_argument('--option', action='append', default=[],
+                        metavar='KEY=VALUE',
+                        help='plugin configuration, e.g. ParallelActions=4')
+    parser.add_argument('--json', help='write the results to a file')
+    parser.add_argument('--compare', help='baseline results (JSON)')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed CPU time increase over the baseline')
+    args = parser.parse_args(argv)
+    args.boxes = [int(count) for count in args.boxes.split(',')]
+    args.option = dict(option.split('=', 1) for option in args.option)
+    return args
+
+
+def main(argv=None):
+    """ Run the benchmark """
+    args = parse_args(argv)
+    collectd = Collectd()
+    sys.modules['collectd'] = collectd
+    import fritzcollectd  # pylint: disable=import-outside-toplevel
+
+    results = []
+    print('{:>6} {:>8} {:>11} {:>11} {:>7} {:>9} {:>10} {:>8}'.format(
+        'boxes', 'init s', 'latency ms', 'p95 ms', 'calls', 'cpu ms',
+        'alloc KiB', 'warnings'))
+    for count in args.boxes:
+        collectd.warnings = 0
+        result = benchmark(fritzcollectd, collectd, count, args)
+        results.append(result)
+        print('{boxes:>6} {init_s:>8.2f} {latency_ms:>11.2f} '
+              '{latency_p95_ms:>11.2f} {calls:>7.1f} {cpu_ms:>9.1f} '
+              '{alloc:>10} {warnings:>8}'.format(
+                  alloc='-' if result['alloc_kib'] is None
+                  else '{:.0f}'.format(result['alloc_kib']), **result))
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline),
+                                  args.tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
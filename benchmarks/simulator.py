@@ -0,0 +1,333 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+# pylint: disable=c-extension-no-member
+
+""" Local TR-064 simulator for the fritzcollectd benchmarks
+
+    Every simulated router is a HTTP server on localhost that serves the
+    device and service descriptions as well as the SOAP control URLs of the
+    services read by fritzcollectd. Latency, jitter, error rate and the
+    number of DECT devices and hosts are configurable.
+"""
+
+import random
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from lxml import etree
+
+DEVICE_NS = 'urn:schemas-upnp-org:device-1-0'
+SERVICE_NS = 'urn:schemas-upnp-org:service-1-0'
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+MODEL = 'FRITZ!Box 7590 (Simulator)'
+FIRMWARE = '154.07.12'
+
+SOAP_FAULT = """<?xml version="1.0"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+<s:Body><s:Fault><faultcode>s:Client</faultcode>
+<faultstring>UPnPError</faultstring><detail>
+<UPnPError xmlns="urn:schemas-upnp-org:control-1-0">
+<errorCode>{}</errorCode><errorDescription>{}</errorDescription>
+</UPnPError></detail></s:Fault></s:Body></s:Envelope>"""
+
+# Services of the device descriptions:
+# {description: [(service id, service type, {action: {argument: value}})]}
+# Values that are callables are called with the router and the arguments of
+# the request. Actions with input arguments list them with the value None.
+SERVICES = {
+    'igddesc.xml': [
+        ('WANIPConn1', 'urn:schemas-upnp-org:service:WANIPConnection:1',
+         {'GetStatusInfo': {'NewConnectionStatus': 'Connected',
+                            'NewUptime': lambda router, _: router.uptime}}),
+        ('WANCommonIFC1',
+         'urn:schemas-upnp-org:service:WANCommonInterfaceConfig:1',
+         {'GetCommonLinkProperties': {
+             'NewLayer1DownstreamMaxBitRate': 109000000,
+             'NewLayer1UpstreamMaxBitRate': 42000000,
+             'NewPhysicalLinkStatus': 'Up'},
+          'GetAddonInfos': {
+              'NewByteSendRate': 3438,
+              'NewByteReceiveRate': 67649,
+              'NewTotalBytesSent': lambda router, _: 1000 * router.uptime,
+              'NewTotalBytesReceived':
+              lambda router, _: 20000 * router.uptime}}),
+    ],
+    'tr64desc.xml': [
+        ('DeviceInfo1', 'urn:dslforum-org:service:DeviceInfo:1',
+         {'GetInfo': {'NewModelName': MODEL,
+                      'NewUpTime': lambda router, _: router.uptime}}),
+        ('WANIPConnection1', 'urn:dslforum-org:service:WANIPConnection:1',
+         {'GetStatusInfo': {'NewConnectionStatus': 'Connected',
+                            'NewUptime': lambda router, _: router.uptime}}),
+        ('WANCommonInterfaceConfig1',
+         'urn:dslforum-org:service:WANCommonInterfaceConfig:1',
+         {'GetCommonLinkProperties': {
+             'NewLayer1DownstreamMaxBitRate': 109000000,
+             'NewLayer1UpstreamMaxBitRate': 42000000,
+             'NewPhysicalLinkStatus': 'Up'},
+          'X_AVM-DE_GetOnlineMonitor': {
+              'NewSyncGroupIndex': None,
+              'Newds_current_bps': lambda router, _: router.samples(80000),
+              'Newus_current_bps': lambda router, _: router.samples(4000)}}),
+        ('LANEthernetInterfaceConfig1',
+         'urn:dslforum-org:service:LANEthernetInterfaceConfig:1',
+         {'GetStatistics': {
+             'NewBytesSent': lambda router, _: 5000 * router.uptime,
+             'NewBytesReceived': lambda router, _: 300 * router.uptime}}),
+        ('X_AVM-DE_Homeauto1', 'urn:dslforum-org:service:X_AVM-DE_Homeauto:1',
+         {'GetGenericDeviceInfos': {
+             'NewIndex': None,
+             'NewAIN': lambda _, arguments: '08761 {:07d}'.format(
+                 int(arguments['NewIndex'])),
+             'NewMultimeterPower': 1673,
+             'NewMultimeterEnergy': 5182,
+             'NewTemperatureCelsius': 225,
+             'NewSwitchState': 'ON'}}),
+        ('Hosts1', 'urn:dslforum-org:service:Hosts:1',
+         {'X_AVM-DE_GetHostListPath': {
+             'NewX_AVM-DE_HostListPath': '/devicehostlist.lua?sid=1'}}),
+    ],
+}
+
+
+# Arguments returned as text by callables (all other callables return numbers)
+TEXT_ARGUMENTS = {'NewAIN', 'Newds_current_bps', 'Newus_current_bps'}
+
+
+def _description(services):
+    """ Device description (igddesc.xml / tr64desc.xml) """
+    root = etree.Element('root', nsmap={None: DEVICE_NS})
+    system_version = etree.SubElement(root, 'systemVersion')
+    etree.SubElement(system_version, 'Display').text = FIRMWARE
+    device = etree.SubElement(root, 'device')
+    etree.SubElement(device, 'modelName').text = MODEL
+    service_list = etree.SubElement(device, 'serviceList')
+    for service_id, service_type, _ in services:
+        service = etree.SubElement(service_list, 'service')
+        etree.SubElement(service, 'serviceType').text = service_type
+        etree.SubElement(service, 'serviceId').text = \
+            'urn:upnp-org:serviceId:' + service_id
+        etree.SubElement(service, 'controlURL').text = \
+            '/upnp/control/' + service_id
+        etree.SubElement(service, 'eventSubURL').text = \
+            '/upnp/event/' + service_id
+        etree.SubElement(service, 'SCPDURL').text = '/{}SCPD.xml'.format(
+            service_id)
+    return etree.tostring(root, xml_declaration=True, encoding='utf-8')
+
+
+def _scpd(actions):
+    """ Service description (SCPD) with the actions of a service """
+    root = etree.Element('scpd', nsmap={None: SERVICE_NS})
+    action_list = etree.SubElement(root, 'actionList')
+    state_table = etree.SubElement(root, 'serviceStateTable')
+    for action_name, arguments in sorted(actions.items()):
+        action = etree.SubElement(action_list, 'action')
+        etree.SubElement(action, 'name').text = action_name
+        argument_list = etree.SubElement(action, 'argumentList')
+        for name, value in sorted(arguments.items()):
+            argument = etree.SubElement(argument_list, 'argument')
+            etree.SubElement(argument, 'name').text = name
+            etree.SubElement(argument, 'direction').text = \
+                'in' if value is None else 'out'
+            etree.SubElement(argument, 'relatedStateVariable').text = \
+                'X_' + name
+            variable = etree.SubElement(state_table, 'stateVariable')
+            etree.SubElement(variable, 'name').text = 'X_' + name
+            text = isinstance(value, str) or name in TEXT_ARGUMENTS
+            etree.SubElement(variable, 'dataType').text = \
+                'string' if text else 'ui4'
+    return etree.tostring(root, xml_declaration=True, encoding='utf-8')
+
+
+def _host_list(hosts):
+    """ Host list document (X_AVM-DE_GetHostListPath) """
+    root = etree.Element('List')
+    for index in range(hosts):
+        item = etree.SubElement(root, 'Item')
+        etree.SubElement(item, 'Index').text = str(index + 1)
+        etree.SubElement(item, 'IPAddress').text = \
+            '192.168.178.{}'.format(index % 250 + 2)
+        etree.SubElement(item, 'Active').text = str(index % 3 and 1)
+        etree.SubElement(item, 'HostName').text = 'host{}'.format(index)
+        etree.SubElement(item, 'InterfaceType').text = \
+            ['Ethernet', '802.11'][index % 2]
+        etree.SubElement(item, 'X_AVM-DE_Guest').text = \
+            '1' if index % 5 == 0 else '0'
+    return etree.tostring(root, xml_declaration=True, encoding='utf-8')
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """ Serves the descriptions and answers the SOAP requests """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, avoid waiting for the ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Descriptions and host list """
+        router = self.server.router
+        document = router.documents.get(self.path.split('?')[0])
+        if self.path.startswith('/devicehostlist.lua'):
+            document = router.host_list
+        if document is None:
+            self._respond(404, b'')
+        else:
+            self._respond(200, document)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ SOAP requests """
+        router = self.server.router
+        request = self.rfile.read(int(self.headers['Content-Length']))
+        router.delay()
+        service_type, action = self.headers['soapaction'].split('#')
+        arguments = dict(
+            (etree.QName(element).localname, element.text)
+            for element in etree.fromstring(request).iter()
+            if element.text and element.text.strip())
+        response = router.respond(service_type, action, arguments)
+        if response is None:
+            self._respond(500, SOAP_FAULT.format(
+                713, 'SpecifiedArrayIndexInvalid').encode('utf-8'))
+        elif router.failed():
+            self._respond(500, SOAP_FAULT.format(
+                501, 'ActionFailed').encode('utf-8'))
+        else:
+            self._respond(200, response)
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server that handles every connection in its own thread """
+    daemon_threads = True
+
+
+class Router(object):
+    """ Simulated router
+
+        latency: Average response time of a SOAP request in seconds
+        jitter: Maximal deviation from the latency in seconds
+        error_rate: Probability of a failing SOAP request (UPnP error)
+        devices: Number of DECT devices
+        hosts: Number of hosts in the host list
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, devices=0,
+                 hosts=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.devices = devices
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.documents = {}
+        self._actions = {}
+        for description, services in SERVICES.items():
+            self.documents['/' + description] = _description(services)
+            for service_id, service_type, actions in services:
+                self.documents['/{}SCPD.xml'.format(service_id)] = \
+                    _scpd(actions)
+                for action, arguments in actions.items():
+                    self._actions[(service_type, action)] = arguments
+        self.host_list = _host_list(hosts)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+        self._server.router = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def port(self):
+        """ Port of the TR-064 interface """
+        return self._server.server_address[1]
+
+    @property
+    def uptime(self):
+        """ Seconds since the router was started """
+        return int(time.time() - self.started)
+
+    def samples(self, average):
+        """ Online monitor history (20 samples, newest first) """
+        return ','.join(str(int(average * self._random.uniform(0.5, 1.5)))
+                        for _ in range(20))
+
+    def start(self):
+        """ Start serving requests """
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving requests """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def delay(self):
+        """ Simulate the response time """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(-self.jitter,
+                                                        self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def failed(self):
+        """ Whether the current request fails """
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def respond(self, service_type, action, arguments):
+        """ SOAP response of an action, None for invalid indices """
+        if 'NewIndex' in arguments and \
+                int(arguments['NewIndex']) >= self.devices:
+            return None
+        values = ''.join(
+            '<{0}>{1}</{0}>'.format(name, value(self, arguments)
+                                    if callable(value) else value)
+            for name, value in sorted(self._actions[(service_type,
+                                                     action)].items())
+            if value is not None)
+        return ('<?xml version="1.0"?>\n'
+                '<s:Envelope xmlns:s="{namespace}"><s:Body>'
+                '<u:{action}Response xmlns:u="{service_type}">{values}'
+                '</u:{action}Response></s:Body></s:Envelope>'.format(
+                    namespace=SOAP_NS, action=action,
+                    service_type=service_type,
+                    values=values)).encode('utf-8')
@@ -20,279 +20,1234 @@
 # SOFTWARE.
 
 # pylint: disable=bad-option-value,useless-object-inheritance
+# pylint: disable=import-outside-toplevel
+# pylint: disable=too-many-lines
 
 """ fritzcollectd - FRITZ!Box collectd plugin """
 
+import fnmatch
+import functools
+import random
+import threading
+import time
+
 from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from timeit import default_timer
+
+try:
+    import collectd  # pylint: disable=import-error
+except ImportError:
+    # Not loaded by collectd, e.g. by the exporter
+    from fritzcollectd import standalone as collectd
+
+from fritzcollectd.onlinemonitor import OnlineMonitor, aggregate
+from fritzcollectd.quarantine import Quarantine
+from fritzcollectd.responsecache import ResponseCache
+from fritzcollectd.schedule import AdaptiveSchedule
+from fritzcollectd.statistics import ReadStatistics
+from fritzcollectd.workerpool import WorkerPool
+
+# fritzconnection, requests and lxml (and the modules of this package using
+# them) are only imported when the routers are connected, which happens in
+# the background (see callback_init). Loading the plugin stays fast.
+# Defaults of fritzconnection:
+FRITZ_IP_ADDRESS = '169.254.1.1'
+FRITZ_TCP_PORT = 49000
+FRITZ_USERNAME = 'dslf-config'
 
-import fritzconnection
-import pbr.version
 
-from lxml.etree import XMLSyntaxError  # pylint: disable=no-name-in-module
+def _get_version():
+    """ Version of the package
+
+        Read from the metadata of the installed package. pbr (which imports
+        setuptools and takes most of the plugin's loading time) is only used
+        for a source checkout or before Python 3.8.
+    """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        pass
+    else:
+        try:
+            return version('fritzcollectd')
+        except PackageNotFoundError:
+            pass
+    import pbr.version
+    return pbr.version.VersionInfo('fritzcollectd').release_string()
 
-import collectd  # pylint: disable=import-error
 
-__version__ = pbr.version.VersionInfo('fritzcollectd').release_string()
+__version__ = _get_version()
 
 
 CONFIGS = []
 
 
+# Connection attempts of all routers (at most 16 at a time)
+RECONNECTOR = WorkerPool(16)
+
+# Responses shared by the module blocks that read the same router
+RESPONSE_CACHE = ResponseCache()
+
+
+def _matches(patterns, names):
+    """ Whether one of the glob patterns matches one of the names """
+    return any(fnmatch.fnmatchcase(name, pattern)
+               for pattern in patterns for name in names)
+
+
+def _identity(value):
+    """ Conversion of values that are dispatched as read """
+    return value
+
+
 class FritzCollectd(object):
     """ Collect data from FRITZ!Box and dispatch them to collectd """
 
-    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
 
     PLUGIN_NAME = 'fritzbox'
 
     ServiceAction = namedtuple(
         'ServiceAction', ['service', 'action',
-                          'index_field', 'instance_field', 'instance_prefix'])
-    ServiceAction.__new__.__defaults__ = (None, None, None)
+                          'index_field', 'instance_field', 'instance_prefix',
+                          'tier'])
+    ServiceAction.__new__.__defaults__ = (None, None, None, 'normal')
     Value = namedtuple('ServiceValue', ['value_instance', 'value_type'])
 
+    # Read plan compiled from SERVICE_ACTIONS in init (see _compile_plan)
+    PlannedAction = namedtuple('PlannedAction', ['service_action',
+                                                 'plugin_instance',
+                                                 'extractors'])
+    Extractor = namedtuple('Extractor', ['argument', 'value_instance',
+                                         'value_type', 'conversion'])
+
+    # Service action that can alternatively be read with a single request
+    # via the AHA HTTP interface (HomeautoBackend "aha").
+    HOMEAUTO_SERVICE_ACTION = ServiceAction(
+        'X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos',
+        'NewIndex', 'NewIndex', 'dect')
+
+    # Service action whose history is parsed (OnlineMonitor "aggregate" or
+    # "samples") instead of dispatching the readings.
+    ONLINE_MONITOR_SERVICE_ACTION = ServiceAction(
+        'WANCommonInterfaceConfig:1', 'X_AVM-DE_GetOnlineMonitor')
+
+    # Service action that returns the path of the host list document, the
+    # host statistics are counted from the document (HostList "true").
+    HOST_LIST_SERVICE_ACTION = ServiceAction(
+        'Hosts:1', 'X_AVM-DE_GetHostListPath', tier='hosts')
+
     # Services/Actions/Arguments that are read from the router.
     # dict: {(service, service_action):
     #           {action_argument: (value_instance, value_type)}}
+    # The tier defines how often a service action is polled (see TIERS).
     SERVICE_ACTIONS = OrderedDict([
         (ServiceAction('WANIPConn:1', 'GetStatusInfo'),
          {'NewConnectionStatus': Value('constatus', 'gauge'),
           'NewUptime': Value('uptime', 'uptime')}),
-        (ServiceAction('WANCommonIFC:1', 'GetCommonLinkProperties'),
+        (ServiceAction('WANCommonIFC:1', 'GetCommonLinkProperties',
+                       tier='slow'),
          {'NewPhysicalLinkStatus': Value('dslstatus', 'gauge'),
           'NewLayer1DownstreamMaxBitRate': Value('downstreammax', 'bitrate'),
           'NewLayer1UpstreamMaxBitRate': Value('upstreammax', 'bitrate')}),
-        (ServiceAction('WANCommonIFC:1', 'GetAddonInfos'),
+        (ServiceAction('WANCommonIFC:1', 'GetAddonInfos', tier='fast'),
          {'NewByteSendRate': Value('sendrate', 'bitrate'),
           'NewByteReceiveRate': Value('receiverate', 'bitrate'),
           'NewTotalBytesSent': Value('totalbytessent', 'bytes'),
           'NewTotalBytesReceived': Value('totalbytesreceived', 'bytes')}),
-        (ServiceAction('DeviceInfo:1', 'GetInfo'),
+        (ServiceAction('DeviceInfo:1', 'GetInfo', tier='slow'),
          {'NewUpTime': Value('boxuptime', 'uptime')}),
         (ServiceAction('LANEthernetInterfaceConfig:1', 'GetStatistics'),
          {'NewBytesSent': Value('lan_totalbytessent', 'bytes'),
           'NewBytesReceived': Value('lan_totalbytesreceived', 'bytes')}),
         (ServiceAction('WANCommonInterfaceConfig:1',
-                       'GetCommonLinkProperties'),
+                       'GetCommonLinkProperties', tier='slow'),
          {'NewLayer1DownstreamMaxBitRate':
           Value('linkdownstreammax', 'bitrate'),
           'NewLayer1UpstreamMaxBitRate': Value('linkupstreammax', 'bitrate')}),
-        (ServiceAction('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos',
-                       'NewIndex', 'NewIndex', 'dect'),
+        (HOMEAUTO_SERVICE_ACTION,
          {'NewMultimeterPower': Value('power', 'power'),
           'NewMultimeterEnergy': Value('energy', 'power'),
           'NewTemperatureCelsius': Value('temperature', 'temperature'),
           'NewSwitchState': Value('switchstate', 'gauge')}),
+        (ONLINE_MONITOR_SERVICE_ACTION,
+         {'Newds_current_bps': Value('monitor_receiverate', 'bitrate'),
+          'Newus_current_bps': Value('monitor_sendrate', 'bitrate')}),
+        (HOST_LIST_SERVICE_ACTION,
+         {'NewX_AVM-DE_HostListPath': Value('hosts', 'count')}),
     ])
 
+    # Service actions whose value instances are only known once they are read
+    # (e.g. hosts_active_wlan, monitor_receiverate_p95), Collect and Ignore
+    # select their values when they are read.
+    DERIVED_SERVICE_ACTIONS = (ONLINE_MONITOR_SERVICE_ACTION,
+                               HOST_LIST_SERVICE_ACTION)
+
+    # Service actions that return the same response, they are called once
+    # if ResponseCacheTTL is set: {(service, action): (service, action)}
+    ACTION_ALIASES = {
+        ('WANCommonInterfaceConfig:1', 'GetCommonLinkProperties'):
+        ('WANCommonIFC:1', 'GetCommonLinkProperties'),
+    }
+
+    # Mesh topology (Mesh "true"): (service, action, argument)
+    MESH_LIST_ACTION = ('Hosts:1', 'X_AVM-DE_GetMeshListPath',
+                        'NewX_AVM-DE_MeshListPath')
+    # Maximal number of mesh nodes read in parallel
+    MESH_WORKERS = 16
+
+    # Values that are dispatched as one value of a multi-value type if
+    # CombineValues is enabled: [(rx, tx, value_type, value_instance)]
+    VALUE_PAIRS = [
+        ('totalbytesreceived', 'totalbytessent', 'if_octets', 'wan'),
+        ('lan_totalbytesreceived', 'lan_totalbytessent', 'if_octets', 'lan'),
+    ]
+
+    # Polling tiers: {tier: n} polls the service actions of a tier only
+    # every n-th read (default: every read, the host list every 6th read).
+    TIERS = {'fast': 1, 'normal': 1, 'slow': 1, 'hosts': 6}
+
     CONVERSION = {
         'NewPhysicalLinkStatus': lambda x: 1 if x == 'Up' else 0,
         'NewConnectionStatus': lambda x: 1 if x == 'Connected' else 0,
         'NewByteSendRate': lambda x: 8 * x,
         'NewByteReceiveRate': lambda x: 8 * x,
+        'Newds_current_bps': lambda x: 8 * x,
+        'Newus_current_bps': lambda x: 8 * x,
         'NewTemperatureCelsius': lambda x: float(x) / 10,
         'NewSwitchState': lambda x: 1 if x == 'ON' else 0,
         'NewMultimeterEnergy': lambda x: float(x) / 1000,
         'NewMultimeterPower': lambda x: float(x) / 100
     }
 
-    def __init__(self,  # pylint: disable=too-many-arguments
-                 address=fritzconnection.fritzconnection.FRITZ_IP_ADDRESS,
-                 port=fritzconnection.fritzconnection.FRITZ_TCP_PORT,
-                 user=fritzconnection.fritzconnection.FRITZ_USERNAME,
+    def __init__(self,  # pylint: disable=too-many-locals,too-many-statements
+                 address=FRITZ_IP_ADDRESS,
+                 port=FRITZ_TCP_PORT,
+                 user=FRITZ_USERNAME,
                  password='',
                  hostname='',
                  plugin_instance='',
-                 verbose=''):
+                 verbose='',
+                 parallel_actions=1,
+                 interval=None,
+                 tiers=None,
+                 tier_redispatch='true',
+                 cache_dir=None,
+                 device_refresh=60,
+                 homeauto_backend='tr064',
+                 keep_alive='true',
+                 self_stats='',
+                 reconnect_delay=10,
+                 reconnect_max_delay=600,
+                 timeout=None,
+                 read_deadline=None,
+                 online_monitor='off',
+                 host_list='',
+                 combine_values='',
+                 suppress_unchanged='',
+                 suppress_heartbeat=300,
+                 response_cache_ttl=None,
+                 collect=None,
+                 ignore=None,
+                 quarantine_delay=60,
+                 quarantine_max_delay=3600,
+                 min_interval=None,
+                 max_interval=None,
+                 activity_threshold=0.1,
+                 mesh='',
+                 mesh_refresh=60):
+        # The mesh nodes are read with the same options
+        self._options = dict((key, value) for key, value in locals().items()
+                             if key != 'self')
         self._fritz_address = address
         self._fritz_port = port
         self._fritz_user = user
         self._fritz_password = password
         self._fritz_hostname = hostname
         self._plugin_instance = plugin_instance
+        self._cache_dir = cache_dir
+        self.interval = interval
+        self._schedule = None
+        if max_interval:
+            # Registered with the minimal interval, reads are skipped
+            self.interval = min_interval or interval or 10
+            self._schedule = AdaptiveSchedule(self.interval, max_interval,
+                                              activity_threshold)
+        self._read_deadline = read_deadline
         self._verbose = verbose.lower() in ['true', 'yes']
         if self._verbose:
             collectd.info("fritzcollectd: Verbose logging enabled")
         self._fc = None
+        self._plan = ()
+        self._self_instance = '-'.join(filter(None, [plugin_instance,
+                                                     'self']))
+        self._templates = {}
+        # Value types that are only dispatched if changed: {type: heartbeat}
+        self._suppress = {}
+        for entry in suppress_unchanged.replace(',', ' ').split():
+            value_type, _, heartbeat = entry.partition(':')
+            self._suppress[value_type] = \
+                float(heartbeat) if heartbeat else suppress_heartbeat
+        self._dispatched = {}
+        self._response_cache_ttl = response_cache_ttl
+        self._collect = collect or []
+        self._quarantine = None
+        if quarantine_delay:
+            self._quarantine = Quarantine(quarantine_delay,
+                                          quarantine_max_delay)
+        self._ignore = ignore or []
+        self._value_pairs = []
+        # Value instances of the combined values {value_instance: combined}
+        self._combined = {}
+        if str(combine_values).lower() in ['true', 'yes']:
+            self._combined = dict(
+                (instance, value_instance)
+                for rx_instance, tx_instance, _, value_instance
+                in self.VALUE_PAIRS for instance in [rx_instance, tx_instance])
+            self._value_pairs = [
+                ((plugin_instance, rx_instance),
+                 (plugin_instance, tx_instance), value_type, value_instance)
+                for rx_instance, tx_instance, value_type, value_instance
+                in self.VALUE_PAIRS]
+        self._tiers = dict(self.TIERS, **(tiers or {}))
+        self._tier_redispatch = str(tier_redispatch).lower() in ['true',
+                                                                 'yes']
+        self._reads = 0
+        self._last_values = {}
+        self._device_refresh = device_refresh
+        self._index_counts = {}
+        self._timeout = timeout
+        self._parallel_actions = parallel_actions
+        self._keep_alive = str(keep_alive).lower() in ['true', 'yes']
+        self._session = None
+        self._statistics = None
+        if str(self_stats).lower() in ['true', 'yes']:
+            self._statistics = ReadStatistics()
+        self._reconnect_lock = threading.Lock()
+        self._reconnecting = False
+        self._reconnect_delay = reconnect_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._reconnect_failures = 0
+        self._retry_at = 0
+        self._connecting = None
+        self._online_monitor_mode = online_monitor.lower()
+        self._online_monitor = OnlineMonitor()
+        # Optional service actions that are not read
+        self._disabled = set()
+        if self._online_monitor_mode not in ['aggregate', 'samples']:
+            self._disabled.add(self.ONLINE_MONITOR_SERVICE_ACTION)
+        self._host_list = None
+        self._host_list_enabled = str(host_list).lower() in ['true', 'yes']
+        if not self._host_list_enabled:
+            self._disabled.add(self.HOST_LIST_SERVICE_ACTION)
+        self._aha = None
+        self._aha_enabled = homeauto_backend.lower() == 'aha'
+        self._executor = None
+        if parallel_actions > 1:
+            self._executor = ThreadPoolExecutor(max_workers=parallel_actions)
+        self._mesh_list = None
+        self._mesh_enabled = str(mesh).lower() in ['true', 'yes']
+        self._mesh_refresh = mesh_refresh
+        self._mesh_reads = 0
+        # Mesh nodes: {MAC address: (address, FritzCollectd)}
+        self._mesh_nodes = {}
+        self._mesh_executor = None
 
     def _dispatch_value(self, plugin_instance,
-                        value_type, value_instance, value):
-        """ Dispatch value to collectd """
-        val = collectd.Values()
-        val.host = self._fritz_hostname
-        val.plugin = self.PLUGIN_NAME
-        val.plugin_instance = plugin_instance
-        val.type = value_type
-        val.type_instance = value_instance
-        val.values = [value]
+                        value_type, value_instance, values, timestamp):
+        """ Dispatch values to collectd
+
+            The collectd.Values of every value are only created once and
+            reused, only values and time are passed with each dispatch.
+            Unchanged values of the types in SuppressUnchanged are skipped
+            unless the last dispatch is older than the heartbeat.
+        """
+        key = (plugin_instance, value_type, value_instance)
+        heartbeat = self._suppress.get(value_type)
+        if heartbeat is not None:
+            last = self._dispatched.get(key)
+            if last is not None and last[0] == values and \
+                    timestamp - last[1] < heartbeat:
+                return
+            self._dispatched[key] = (values, timestamp)
+        template = self._templates.get(key)
+        if template is None:
+            template = collectd.Values(
+                host=self._fritz_hostname, plugin=self.PLUGIN_NAME,
+                plugin_instance=plugin_instance, type=value_type,
+                type_instance=value_instance)
+            self._templates[key] = template
         if self._verbose:
             collectd.info("fritzcollectd: Dispatching: host: '{}', "
                           "plugin: '{}', plugin_instance: '{}', type: '{}', "
                           "type_instance: '{}', values: '{}'".format(
-                              val.host, val.plugin, val.plugin_instance,
-                              val.type, val.type_instance, val.values))
-        val.dispatch()
+                              self._fritz_hostname, self.PLUGIN_NAME,
+                              plugin_instance, value_type, value_instance,
+                              values))
+        if self._schedule is None:
+            template.dispatch(values=values, time=timestamp)
+        else:
+            # The values are valid until the next read
+            template.dispatch(values=values, time=timestamp,
+                              interval=self._schedule.interval)
 
     def init(self):
-        """ Initialize the connection to the FRITZ!Box """
-        self._fc = fritzconnection.FritzConnection(
-            address=self._fritz_address, port=self._fritz_port,
-            user=self._fritz_user, password=self._fritz_password)
-        if self._fc.modelname is None:
-            self._fc = None
+        """ Initialize the connection to the FRITZ!Box
+
+            The connection is only used for reading once it is fully
+            initialized (init might run in the background while reading).
+        """
+        self._fc = None
+        self._open_sessions()
+        import fritzconnection
+        if self._cache_dir:
+            from fritzcollectd.descriptioncache import CachedFritzConnection
+            connection = CachedFritzConnection(
+                self._cache_dir,
+                address=self._fritz_address, port=self._fritz_port,
+                user=self._fritz_user, password=self._fritz_password)
+            if connection.cache_error:
+                collectd.warning("fritzcollectd: Failed to cache service "
+                                 "descriptions: {}".format(
+                                     connection.cache_error))
+            elif self._verbose and connection.cache_hit:
+                collectd.info("fritzcollectd: Using cached service "
+                              "descriptions")
+        else:
+            connection = fritzconnection.FritzConnection(
+                address=self._fritz_address, port=self._fritz_port,
+                user=self._fritz_user, password=self._fritz_password)
+        if connection.modelname is None:
             raise IOError("fritzcollectd: Failed to connect to %s" %
                           self._fritz_address)
+        if self._session is not None:
+            self._session.attach(connection)
 
-        if not self._fc.call_action('WANIPConn:1', 'GetStatusInfo'):
-            self._fc = None
+        if not connection.call_action('WANIPConn:1', 'GetStatusInfo'):
             raise IOError("fritzcollectd: Statusinformation via UPnP is "
                           "not enabled")
 
         if self._fritz_password != '':
             # If the 'Allow access for applications' option is disabled,
             # the connection behaves as if it was created without password.
-            if 'WANIPConnection:1' not in self._fc.services.keys():
-                self._fc = None
+            if 'WANIPConnection:1' not in connection.services.keys():
                 raise IOError("fritzcollectd: Allow access for applications "
                               "is not enabled")
 
             try:
-                self._fc.call_action('WANIPConnection:1', 'GetStatusInfo')
+                connection.call_action('WANIPConnection:1', 'GetStatusInfo')
             except fritzconnection.AuthorizationError:
-                self._fc = None
                 raise IOError("fritzcollectd: Incorrect password or "
                               "'FRITZ!Box Settings' rights for user disabled")
         else:
             collectd.info("fritzcollectd: No password configured, "
                           "some values cannot be queried")
 
-        self._filter_service_actions(self.SERVICE_ACTIONS,
-                                     self._fc.actionnames)
+        self._plan = self._compile_plan(connection.actionnames)
+        self._fc = connection
+
+    def _open_sessions(self):
+        """ Create the HTTP sessions (once, on the first init) """
+        if self._keep_alive and self._session is None:
+            from fritzcollectd.session import SoapSession
+            self._session = SoapSession(self._fritz_user,
+                                        self._fritz_password,
+                                        pool_size=self._parallel_actions,
+                                        timeout=self._timeout)
+            self._session.statistics = self._statistics
+        if self._host_list_enabled and self._host_list is None:
+            from fritzcollectd.hosts import HostList
+            self._host_list = HostList(self._fritz_address, self._fritz_port,
+                                       timeout=self._timeout)
+        if self._mesh_enabled and self._mesh_list is None:
+            from fritzcollectd.mesh import MeshList
+            self._mesh_list = MeshList(self._fritz_address, self._fritz_port,
+                                       timeout=self._timeout)
+            self._mesh_executor = ThreadPoolExecutor(
+                max_workers=self.MESH_WORKERS)
+        if self._aha_enabled and self._aha is None:
+            from fritzcollectd.aha import AhaSession
+            self._aha = AhaSession(self._fritz_address, self._fritz_user,
+                                   self._fritz_password,
+                                   timeout=self._timeout)
+
+    def connect(self):
+        """ Connect in the background
 
-    @classmethod
-    def _filter_service_actions(cls, service_actions, actionnames):
-        """ Remove unsupported service actions """
-        for service_action in list(service_actions.keys()):
+            Reads are skipped until the connection is established, a failed
+            attempt is retried like a failed reconnect.
+        """
+        with self._reconnect_lock:
+            self._reconnecting = True
+        self._connecting = RECONNECTOR.submit(self._reconnect, False)
+
+    def wait_connected(self, timeout=None):
+        """ Wait for the running connection attempts (also of the mesh nodes
+            discovered so far)
+
+            Returns whether the router is connected.
+        """
+        connecting = [node._connecting  # pylint: disable=protected-access
+                      for _, node in self._mesh_nodes.values()]
+        wait([future for future in [self._connecting] + connecting
+              if future is not None], timeout)
+        return self._fc is not None
+
+    def reconnect(self):
+        """ Reconnect in the background
+
+            Reads are skipped (the circuit is open) until the connection is
+            established again. Failed attempts are retried with exponential
+            backoff.
+        """
+        self._fc = None
+        self._start_reconnect()
+
+    def _start_reconnect(self):
+        """ Start a reconnect attempt unless one is running or not yet due """
+        with self._reconnect_lock:
+            if self._reconnecting or default_timer() < self._retry_at:
+                return
+            self._reconnecting = True
+        self._connecting = RECONNECTOR.submit(self._reconnect)
+
+    def _reconnect(self, reconnect=True):
+        """ (Re)connect attempt (runs in the background) """
+        if reconnect and self._statistics is not None:
+            self._statistics.reconnects += 1
+        try:
+            self.init()
+        except Exception as error:  # pylint: disable=broad-except
+            self._reconnect_failures += 1
+            delay = min(self._reconnect_max_delay,
+                        self._reconnect_delay *
+                        2 ** (self._reconnect_failures - 1))
+            delay *= random.uniform(0.5, 1.5)
+            self._retry_at = default_timer() + delay
+            collectd.warning("fritzcollectd: Failed to {} to {} ({}), "
+                             "retrying in {:.0f}s".format(
+                                 'reconnect' if reconnect else 'connect',
+                                 self._fritz_address, error, delay))
+        else:
+            self._reconnect_failures = 0
+            self._retry_at = 0
+            collectd.info("fritzcollectd: {} to {}".format(
+                'Reconnected' if reconnect else 'Connected',
+                self._fritz_address))
+        finally:
+            self._reconnecting = False
+
+    @property
+    def name(self):
+        """ Name of the read callback registered for this router """
+        return '-'.join(filter(None, ['fritzcollectd', self._fritz_address,
+                                      self._fritz_hostname,
+                                      self._plugin_instance]))
+
+    def shutdown(self):
+        """ Stop the worker threads and close the connections """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        # A running connection attempt is not waited for, it may block
+        # (the description download has no timeout)
+        if self._connecting is not None:
+            self._connecting.cancel()
+        if self._session is not None:
+            self._session.close()
+        if self._host_list is not None:
+            self._host_list.close()
+        if self._aha is not None:
+            self._aha.close()
+        if self._mesh_list is not None:
+            self._mesh_executor.shutdown()
+            for _, node in self._mesh_nodes.values():
+                node.shutdown()
+            self._mesh_list.close()
+
+    def _compile_plan(self, actionnames):
+        """ Compile the read plan of the router
+
+            The plan contains the enabled service actions of SERVICE_ACTIONS
+            that the router supports, with the plugin instances and value
+            conversions resolved, so that reading only needs to call,
+            convert and dispatch. Every router has its own plan.
+        """
+        plan = []
+        for service_action, arguments in self.SERVICE_ACTIONS.items():
+            if service_action in self._disabled:
+                continue
+            if service_action in self.DERIVED_SERVICE_ACTIONS:
+                # Only the service action can be ignored in advance
+                arguments = {} if self._ignored(service_action) \
+                    else arguments
+            else:
+                # A value is also read if it is selected as combined value
+                arguments = dict(
+                    (argument, value)
+                    for argument, value in arguments.items()
+                    if self._selected(
+                        service_action, value.value_instance,
+                        self._combined.get(value.value_instance,
+                                           value.value_instance)))
+            if not arguments:
+                continue
             if ((service_action.service, service_action.action)
                     not in actionnames):
                 collectd.info("fritzcollectd: Skipping unsupported service "
                               "action: {} {}".format(service_action.service,
                                                      service_action.action))
-                del service_actions[service_action]
+                continue
+            plugin_instance = self._plugin_instance
+            if service_action.instance_field:
+                # The index read is appended to the plugin instance
+                plugin_instance = '{}{}'.format(
+                    plugin_instance + '-' if plugin_instance else '',
+                    service_action.instance_prefix or '')
+            plan.append(self.PlannedAction(service_action, plugin_instance,
+                                           tuple(self.Extractor(
+                                               argument,
+                                               value.value_instance,
+                                               value.value_type,
+                                               self.CONVERSION.get(
+                                                   argument, _identity))
+                                                 for argument, value
+                                                 in arguments.items())))
+        return tuple(plan)
+
+    def _selected(self, service_action, *value_instances):
+        """ Whether a value is selected by the Collect and Ignore patterns
+
+            The patterns match either the service action
+            (``<service>/<action>``) or one of the value instances.
+        """
+        names = ['{}/{}'.format(service_action.service,
+                                service_action.action)] + list(value_instances)
+        return (not self._collect or _matches(self._collect, names)) and \
+            not _matches(self._ignore, names)
+
+    def _ignored(self, service_action):
+        """ Whether all values of the service action are ignored """
+        return _matches(self._ignore, ['{}/{}'.format(service_action.service,
+                                                      service_action.action)])
 
     def read(self):
-        """ Read and dispatch """
-        values = self._read_data(self.SERVICE_ACTIONS, self._fc)
+        """ Read and dispatch (the router and its mesh nodes in parallel) """
+        nodes = self._read_mesh()
+        try:
+            self._read_router()
+        finally:
+            for address, future in nodes:
+                error = future.exception()
+                if error is not None:
+                    collectd.warning("fritzcollectd: Failed to read mesh node "
+                                     "{} ({!r})".format(address, error))
+
+    def _read_router(self):
+        """ Read and dispatch the values of the router """
+        connection = self._fc
+        if connection is None:
+            # Not connected, reconnect in the background and skip the read
+            self._start_reconnect()
+            return
+        if self._schedule is not None and not self._schedule.due():
+            return
+        self._dispatch_read(*self._read_values(connection, self._plan))
+
+    def _read_mesh(self):
+        """ Start reading the mesh nodes (Mesh)
+
+            The topology is read from the mesh master every MeshRefresh
+            reads, the nodes are read like separately configured routers.
+            Returns the addresses and the futures of the node reads.
+        """
+        if not self._mesh_enabled:
+            return []
+        connection = self._fc
+        if connection is not None:
+            if self._mesh_reads % self._mesh_refresh == 0:
+                self._refresh_mesh(connection)
+            self._mesh_reads += 1
+        return [(address, self._mesh_executor.submit(callback_read, node))
+                for address, node in self._mesh_nodes.values()]
+
+    def _refresh_mesh(self, connection):
+        """ Read the mesh topology and create the nodes
+
+            The known nodes are kept if the topology cannot be read for any
+            reason, the read of the router itself must not depend on it.
+        """
+        service, action, argument = self.MESH_LIST_ACTION
+        if (service, action) not in connection.actionnames:
+            collectd.info("fritzcollectd: Skipping unsupported service "
+                          "action: {} {}".format(service, action))
+            return
+        try:
+            addresses = dict(
+                (node, connection.call_action(
+                    'Hosts:1', 'GetSpecificHostEntry',
+                    NewMACAddress=node.mac_address)['NewIPAddress'])
+                for node in self._mesh_list.nodes(
+                    connection.call_action(service, action)[argument]))
+        except Exception as error:  # pylint: disable=broad-except
+            collectd.warning("fritzcollectd: Failed to read the mesh of {} "
+                             "({!r})".format(self._fritz_address, error))
+            return
+        nodes = {}
+        for node, address in addresses.items():
+            known_address, known = self._mesh_nodes.pop(node.mac_address,
+                                                        (None, None))
+            if known_address == address:
+                nodes[node.mac_address] = (address, known)
+                continue
+            if known is not None:
+                known.shutdown()
+            collectd.info("fritzcollectd: Reading mesh node {} ({})".format(
+                node.name, address))
+            known = FritzCollectd(**dict(
+                self._options, address=address, mesh='',
+                plugin_instance='-'.join(filter(None, [self._plugin_instance,
+                                                       node.name]))))
+            known.connect()
+            nodes[node.mac_address] = (address, known)
+        for address, removed in self._mesh_nodes.values():
+            collectd.info("fritzcollectd: Mesh node {} removed".format(
+                address))
+            removed.shutdown()
+        self._mesh_nodes = nodes
+
+    def _read_values(self, connection, plan):
+        """ Read data (and measure the read if SelfStats is enabled)
+
+            Returns a tuple (timestamp, values, statistics).
+        """
+        timestamp = time.time()
+        if self._statistics is None:
+            return timestamp, self._read_data(plan, connection), []
+
+        self._statistics.reset()
+        start = default_timer()
+        try:
+            values = self._read_data(plan, connection)
+        except Exception:
+            self._statistics.failures += 1
+            raise
+        self._statistics.duration = default_timer() - start
+        return timestamp, values, self._statistics.values()
+
+    def _dispatch_read(self, timestamp, values, statistics):
+        """ Dispatch the values and statistics of a read """
+        if self._schedule is not None:
+            self._schedule.update(values)
+        for rx_key, tx_key, value_type, value_instance in self._value_pairs:
+            if rx_key in values and tx_key in values:
+                values[(rx_key[0], value_instance)] = (
+                    value_type, (values.pop(rx_key)[1], values.pop(tx_key)[1]))
+
         for (instance, value_instance), (value_type, value) in values.items():
-            self._dispatch_value(instance, value_type, value_instance, value)
+            if isinstance(value, list):
+                # Samples that are dispatched with the time they were taken
+                for sample_time, sample in value:
+                    self._dispatch_value(instance, value_type, value_instance,
+                                         [sample], sample_time)
+            elif isinstance(value, tuple):
+                # Combined values of a multi-value type
+                self._dispatch_value(instance, value_type, value_instance,
+                                     list(value), timestamp)
+            else:
+                self._dispatch_value(instance, value_type, value_instance,
+                                     [value], timestamp)
+
+        # Statistics about the plugin's own performance
+        for value_type, value_instance, value in statistics:
+            self._dispatch_value(self._self_instance,
+                                 value_type, value_instance, [value],
+                                 timestamp)
 
-    def _read_data(self, service_actions, connection):
+    def _read_data(self, plan, connection):
         """ Read data from the FRITZ!Box
 
-            The data is read from all services & actions defined in
-            SERVICE_ACTIONS.
+            The data is read from all service actions of the read plan.
             This function returns a dict in the following format:
-            {value_instance: (value_type, value)}
+            {(plugin_instance, value_instance): (value_type, value)}
         """
 
-        # Don't try to gather data if the connection is not available
-        if connection is None:
-            return {}
-
-        # Construct a dict:
-        # {(plugin_instance, value_instance): (value_type, value)} from the
-        # queried results and applies a value conversion (if defined)
-        values = {}
-        for service_action in service_actions:
-            index = 0
-            while True:
-                parameters = {service_action.index_field: index} \
-                             if service_action.index_field else {}
-                if self._verbose:
-                    collectd.info("fritzcollectd: Calling action: "
-                                  "{} {} {}".format(service_action.service,
-                                                    service_action.action,
-                                                    parameters))
-                readings = connection.call_action(
-                    service_action.service, service_action.action,
-                    **parameters)
-                if not readings:
-                    if self._verbose:
-                        collectd.info("fritzcollectd: No readings received")
-                    break
-
-                plugin_instance = [self._plugin_instance]
-                if service_action.instance_field:
-                    readings.update(parameters)
-                    plugin_instance.append('{}{}'.format(
-                        service_action.instance_prefix,
-                        readings[service_action.instance_field]
-                    ))
-                plugin_instance = '-'.join(filter(None, plugin_instance))
-
-                values.update({  # pragma: no branch
-                    (plugin_instance, value.value_instance): (
-                        value.value_type,
-                        self.CONVERSION.get(action_argument, lambda x: x)(
-                            readings[action_argument])
-                    )
-                    for (action_argument, value)
-                    in service_actions[service_action].items()
-                })
-
-                if not service_action.index_field:
-                    break
+        # Only poll the service actions whose tier is due in this read
+        due = [planned for planned in plan
+               if self._reads % self._tiers[planned.service_action.tier] == 0
+               and not self._skipped(planned.service_action)]
+        self._reads += 1
+
+        deadline = None
+        if self._read_deadline:
+            deadline = default_timer() + self._read_deadline
+
+        # The results are merged in the order of the plan so that the values
+        # are dispatched in the same order in parallel mode.
+        failed = []
+        if self._executor is not None:
+            futures = [
+                self._executor.submit(self._read_service_action, planned,
+                                      connection, deadline, failed)
+                for planned in due]
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - default_timer())
+            done, _ = wait(futures, timeout)
+            results = [future.result() if future in done else None
+                       for future in futures]
+            for future in futures:
+                future.cancel()
+        else:
+            results = [
+                self._read_service_action(planned, connection, deadline,
+                                          failed)
+                for planned in due]
+        results = dict((planned.service_action, result)
+                       for planned, result in zip(due, results))
+        self._last_values.update((service_action, result)
+                                 for service_action, result
+                                 in results.items() if result is not None)
+        failed = list(failed)
+        self._report_unread([planned.service_action for planned in due
+                             if results[planned.service_action] is None and
+                             planned.service_action not in failed], failed)
+
+        values = OrderedDict()
+        for planned in plan:
+            if results.get(planned.service_action) is not None:
+                values.update(results[planned.service_action])
+            elif self._tier_redispatch:
+                # Samples have their own time and are only dispatched once
+                values.update(
+                    (key, value) for key, value
+                    in self._last_values.get(planned.service_action,
+                                             {}).items()
+                    if not isinstance(value[1], list))
+        return values
+
+    def _report_unread(self, unread, failed):
+        """ Report the service actions that were not read in time (deadline
+            or timeout) and the ones that failed
+        """
+        if self._statistics is not None:
+            self._statistics.unread = len(unread)
+            self._statistics.failed_calls = len(failed)
+            if self._quarantine is not None:
+                self._statistics.quarantined = len(self._quarantine)
+        for service_actions, message in [
+                (unread, "Values of {} not read in time: {}"),
+                (failed, "Failed to read values of {}: {}")]:
+            if service_actions:
+                collectd.warning("fritzcollectd: " + message.format(
+                    self._fritz_address, ', '.join(
+                        '{} {}'.format(service_action.service,
+                                       service_action.action)
+                        for service_action in service_actions)))
+
+    def _read_service_action(self, planned, connection, deadline=None,
+                             failed=None):
+        """ Read the values of a single service action of the plan
+
+            Returns None if the service action could not be read before the
+            deadline or failed. Indexed service actions may return the values
+            of the indices read until then. Failed service actions (as
+            opposed to the ones not read in time) are added to failed.
+        """
+        if deadline is not None and default_timer() >= deadline:
+            return None
+        service_action = planned.service_action
+        # Whether the calls of the indices are tracked (by _read_indices)
+        tracks_indices = False
+        # Whether no values are a failure (None always is): only for plain
+        # TR-064 calls. For the other reads it means that there is nothing
+        # new (no online monitor samples since the last read, no devices).
+        empty_fails = False
+        # Whether None means that a call timed out (only for TR-064 calls)
+        none_timed_out = False
+        if self._aha is not None and \
+                service_action == self.HOMEAUTO_SERVICE_ACTION:
+            read = functools.partial(self._read_aha, planned)
+        elif service_action == self.ONLINE_MONITOR_SERVICE_ACTION:
+            read = functools.partial(self._read_online_monitor, planned,
+                                     connection)
+        elif service_action == self.HOST_LIST_SERVICE_ACTION:
+            read = functools.partial(self._read_host_list, planned,
+                                     connection)
+        else:
+            read = functools.partial(self._read_indices, planned, connection,
+                                     deadline)
+            tracks_indices = bool(service_action.index_field)
+            empty_fails = not tracks_indices
+            none_timed_out = True
+        from fritzconnection import AuthorizationError
+        from requests.exceptions import ReadTimeout
+        try:
+            values = read()
+        except ReadTimeout:
+            values = None
+            none_timed_out = True
+        except AuthorizationError:
+            # The user lacks the rights for the action
+            values = None
+            none_timed_out = False
+        # Indexed service actions track their indices (and may have none)
+        succeeded = tracks_indices or (
+            values is not None and (bool(values) or not empty_fails))
+        self._track_call(service_action, None, succeeded)
+        if not succeeded and failed is not None and \
+                not (values is None and none_timed_out):
+            failed.append(service_action)
+        return values
+
+    def _skipped(self, service_action, index=None):
+        """ Whether the call is quarantined """
+        return self._quarantine is not None and \
+            self._quarantine.skipped((service_action, index))
+
+    def _track_call(self, service_action, index, success):
+        """ Track failing calls and quarantine them (QuarantineDelay) """
+        if self._quarantine is None:
+            return
+        key = (service_action, index)
+        name = '{} {}{}'.format(service_action.service, service_action.action,
+                                '' if index is None
+                                else ' index {}'.format(index))
+        if success:
+            if self._quarantine.succeeded(key):
+                collectd.info("fritzcollectd: {} of {} succeeded again".format(
+                    name, self._fritz_address))
+            return
+        delay = self._quarantine.failed(key)
+        if delay is not None:
+            if index is None:
+                # Don't redispatch stale values while quarantined
+                self._last_values.pop(service_action, None)
+            collectd.warning("fritzcollectd: {} of {} keeps failing, "
+                             "retrying in {:.0f}s".format(
+                                 name, self._fritz_address, delay))
+
+    def _call_action(self, connection, service_action, **arguments):
+        """ Call the action of a service action
+
+            If ResponseCacheTTL is set, the response is shared with all
+            module blocks reading the same router (and with the aliases of
+            the action).
+        """
+        call = functools.partial(connection.call_action,
+                                 service_action.service,
+                                 service_action.action, **arguments)
+        if not self._response_cache_ttl:
+            return call()
+        action = (service_action.service, service_action.action)
+        key = (self._fritz_address, self._fritz_port, self._fritz_user) + \
+            self.ACTION_ALIASES.get(action, action) + \
+            tuple(sorted(arguments.items()))
+        return RESPONSE_CACHE.get(key, self._response_cache_ttl, call)
+
+    def _read_indices(self, planned, connection, deadline):
+        """ Read the values of a service action via TR-064
+
+            Indexed service actions (e.g. DECT devices) are discovered by
+            reading with increasing index until no more readings are
+            received. The number of indices is remembered, so that following
+            reads don't need the failing call until the next discovery.
+        """
+        from requests.exceptions import ReadTimeout
+        service_action = planned.service_action
+        values = OrderedDict()
+        count = self._get_index_count(service_action)
+        index = 0
+        while count is None or index < count:
+            parameters = {service_action.index_field: index} \
+                         if service_action.index_field else {}
+            if index and deadline is not None and default_timer() >= deadline:
+                return values
+            if service_action.index_field and \
+                    self._skipped(service_action, index):
                 index += 1
+                continue
+            if self._verbose:
+                collectd.info("fritzcollectd: Calling action: "
+                              "{} {} {}".format(service_action.service,
+                                                service_action.action,
+                                                parameters))
+            start = default_timer()
+            try:
+                readings = self._call_action(connection, service_action,
+                                             **parameters)
+            except ReadTimeout:
+                if service_action.index_field:
+                    self._track_call(service_action, index, False)
+                return values or None
+            if self._statistics is not None:
+                self._statistics.add_call(service_action.service,
+                                          service_action.action,
+                                          default_timer() - start)
+            if not readings:
+                if self._verbose:
+                    collectd.info("fritzcollectd: No readings received")
+                break
+            if service_action.index_field:
+                self._track_call(service_action, index, True)
+
+            readings.update(parameters)
+            values.update(self._convert_readings(planned, readings))
+
+            if not service_action.index_field:
+                break
+            index += 1
+
+        if service_action.index_field:
+            self._set_index_count(service_action, count, index)
+        return values
+
+    def _read_aha(self, planned):
+        """ Read all smart home devices via the AHA HTTP interface """
+        if self._verbose:
+            collectd.info("fritzcollectd: Reading device list via AHA")
+        # pylint: disable=no-name-in-module
+        from lxml.etree import XMLSyntaxError
+        values = OrderedDict()
+        start = default_timer()
+        try:
+            device_infos = self._aha.device_infos()
+        except (IOError, XMLSyntaxError) as error:
+            # The AHA interface doesn't affect the TR-064 connection, only
+            # the devices are not read
+            collectd.warning("fritzcollectd: Failed to read the devices of "
+                             "{} via AHA ({})".format(self._fritz_address,
+                                                      error))
+            return None
+        if self._statistics is not None:
+            self._statistics.add_call('aha', 'getdevicelistinfos',
+                                      default_timer() - start)
+        for readings in device_infos:
+            values.update(self._convert_readings(planned, readings))
+        return values
+
+    def _read_online_monitor(self, planned, connection):
+        """ Read the history of the online monitor
 
+            The samples that are new since the last read are either
+            aggregated (minimum, maximum, mean and 95th percentile) or
+            returned as list of (time, value) tuples to be dispatched with
+            the time they were taken at.
+        """
+        service_action = planned.service_action
+        start = default_timer()
+        readings = self._call_action(connection, service_action,
+                                     NewSyncGroupIndex=0)
+        if self._statistics is not None:
+            self._statistics.add_call(service_action.service,
+                                      service_action.action,
+                                      default_timer() - start)
+        extractors = dict((extractor.argument, extractor)
+                          for extractor in planned.extractors)
+        values = OrderedDict()
+        for argument, samples in self._online_monitor.samples(
+                readings, [extractor.argument
+                           for extractor in planned.extractors],
+                time.time()).items():
+            extractor = extractors[argument]
+            samples = [(sample_time, extractor.conversion(sample))
+                       for sample_time, sample in samples]
+            if not samples:
+                continue
+            if self._online_monitor_mode == 'samples':
+                if self._selected(service_action, extractor.value_instance):
+                    values[(planned.plugin_instance,
+                            extractor.value_instance)] = (
+                                extractor.value_type, samples)
+                continue
+            for aggregation, aggregated in aggregate(
+                    [sample for _, sample in samples]).items():
+                value_instance = '{}_{}'.format(extractor.value_instance,
+                                                aggregation)
+                if self._selected(service_action, value_instance):
+                    values[(planned.plugin_instance, value_instance)] = (
+                        extractor.value_type, aggregated)
         return values
 
+    def _read_host_list(self, planned, connection):
+        """ Read the host statistics from the host list document """
+        # pylint: disable=no-name-in-module
+        from lxml.etree import XMLSyntaxError
+        service_action = planned.service_action
+        start = default_timer()
+        readings = self._call_action(connection, service_action)
+        extractor, = planned.extractors
+        try:
+            statistics = self._host_list.statistics(
+                readings[extractor.argument])
+        except (IOError, KeyError, XMLSyntaxError) as error:
+            # No path in the response (an error response) or the download
+            # failed (e.g. the session id expired), only the hosts are not
+            # read
+            collectd.warning("fritzcollectd: Failed to read the host list of "
+                             "{} ({})".format(self._fritz_address, error))
+            return None
+        if self._statistics is not None:
+            self._statistics.add_call(service_action.service,
+                                      service_action.action,
+                                      default_timer() - start)
+        return OrderedDict(
+            ((planned.plugin_instance, value_instance), (extractor.value_type,
+                                                         count))
+            for value_instance, count in statistics.items()
+            if self._selected(service_action, value_instance))
+
+    @staticmethod
+    def _convert_readings(planned, readings):
+        """ Convert the readings of a service action to values
+
+            Returns a dict:
+            {(plugin_instance, value_instance): (value_type, value)}
+        """
+        plugin_instance = planned.plugin_instance
+        if planned.service_action.instance_field:
+            plugin_instance += str(
+                readings[planned.service_action.instance_field])
+
+        return OrderedDict(  # pragma: no branch
+            ((plugin_instance, extractor.value_instance), (
+                extractor.value_type,
+                extractor.conversion(readings[extractor.argument])))
+            for extractor in planned.extractors
+            if extractor.argument in readings
+        )
+
+    def _get_index_count(self, service_action):
+        """ Number of indices of an indexed service action
+
+            Returns None if the indices have to be discovered.
+        """
+        if service_action not in self._index_counts:
+            return None
+        count, discovered = self._index_counts[service_action]
+        if self._reads - discovered >= self._device_refresh:
+            return None
+        return count
+
+    def _set_index_count(self, service_action, count, index):
+        """ Remember the number of discovered indices """
+        if count is None:
+            self._index_counts[service_action] = (index, self._reads)
+        elif index < count:
+            # A device disappeared, discover again in the next read
+            del self._index_counts[service_action]
+
+
+# Configuration keys: {key: (parameter, conversion)}
+CONFIG_PARAMETERS = {
+    'Address': ('address', str),
+    'Port': ('port', int),
+    'User': ('user', str),
+    'Password': ('password', str),
+    'Hostname': ('hostname', str),
+    'Instance': ('plugin_instance', str),
+    'Verbose': ('verbose', str),
+    'ParallelActions': ('parallel_actions', int),
+    'TierRedispatch': ('tier_redispatch', str),
+    'CacheDir': ('cache_dir', str),
+    'DeviceRefresh': ('device_refresh', int),
+    'HomeautoBackend': ('homeauto_backend', str),
+    'KeepAlive': ('keep_alive', str),
+    'SelfStats': ('self_stats', str),
+    'ReconnectDelay': ('reconnect_delay', float),
+    'ReconnectMaxDelay': ('reconnect_max_delay', float),
+    'Timeout': ('timeout', float),
+    'ReadDeadline': ('read_deadline', float),
+    'OnlineMonitor': ('online_monitor', str),
+    'HostList': ('host_list', str),
+    'CombineValues': ('combine_values', str),
+    'SuppressUnchanged': ('suppress_unchanged', str),
+    'SuppressHeartbeat': ('suppress_heartbeat', float),
+    'ResponseCacheTTL': ('response_cache_ttl', float),
+    'QuarantineDelay': ('quarantine_delay', float),
+    'QuarantineMaxDelay': ('quarantine_max_delay', float),
+    'Interval': ('interval', float),
+    'MinInterval': ('min_interval', float),
+    'MaxInterval': ('max_interval', float),
+    'ActivityThreshold': ('activity_threshold', float),
+    'Mesh': ('mesh', str),
+    'MeshRefresh': ('mesh_refresh', int),
+}
+
+TIER_PARAMETERS = {'TierFast': 'fast', 'TierNormal': 'normal',
+                   'TierSlow': 'slow', 'TierHosts': 'hosts'}
+
+# Configuration keys that count reads and therefore must be at least 1
+POSITIVE_PARAMETERS = set(TIER_PARAMETERS) | {'MeshRefresh'}
+
+# Configuration keys that can have several values and can be repeated
+LIST_PARAMETERS = {'Collect': 'collect', 'Ignore': 'ignore'}
+
 
 def callback_configure(config):
     """ Configure callback """
     params = {}
     for node in config.children:
-        if node.key == 'Address':
-            params['address'] = node.values[0]
-        elif node.key == 'Port':
-            params['port'] = int(node.values[0])
-        elif node.key == 'User':
-            params['user'] = node.values[0]
-        elif node.key == 'Password':
-            params['password'] = node.values[0]
-        elif node.key == 'Hostname':
-            params['hostname'] = node.values[0]
-        elif node.key == 'Instance':
-            params['plugin_instance'] = node.values[0]
-        elif node.key == 'Verbose':
-            params['verbose'] = node.values[0]
+        if node.key in POSITIVE_PARAMETERS and int(node.values[0]) < 1:
+            collectd.warning('fritzcollectd: {} must be at least 1, '
+                             'ignoring {}'.format(node.key, node.values[0]))
+        elif node.key in CONFIG_PARAMETERS:
+            parameter, conversion = CONFIG_PARAMETERS[node.key]
+            params[parameter] = conversion(node.values[0])
+        elif node.key in TIER_PARAMETERS:
+            params.setdefault('tiers', {})[TIER_PARAMETERS[node.key]] = \
+                int(node.values[0])
+        elif node.key in LIST_PARAMETERS:
+            params.setdefault(LIST_PARAMETERS[node.key], []).extend(
+                str(value) for value in node.values)
         else:
             collectd.warning('fritzcollectd: Unknown config %s' % node.key)
-    CONFIGS.append(FritzCollectd(**params))
+    fritz_collectd = FritzCollectd(**params)
+    CONFIGS.append(fritz_collectd)
+
+    # Every router gets its own read callback so that collectd schedules
+    # them independently (with their own interval) on its read threads.
+    kwargs = {'data': fritz_collectd, 'name': fritz_collectd.name}
+    if fritz_collectd.interval:
+        kwargs['interval'] = fritz_collectd.interval
+    collectd.register_read(callback_read, **kwargs)
 
 
 def callback_init():
-    """ Init callback """
+    """ Init callback
+
+        The routers are connected in parallel in the background, so that an
+        unreachable router neither delays collectd's startup nor the other
+        routers. Every router is read as soon as its connection is ready.
+    """
     for config in CONFIGS:
-        config.init()
+        config.connect()
 
 
-def callback_read():
-    """ Read callback """
-    for config in CONFIGS:
-        try:
-            config.read()
-        except XMLSyntaxError:
-            collectd.warning('fritzcollectd: Invalid data received, '
-                             'attempting to reconnect')
-            config.init()
+def callback_read(config):
+    """ Read callback (registered per router) """
+    from lxml.etree import XMLSyntaxError  # pylint: disable=no-name-in-module
+    try:
+        config.read()
+    except XMLSyntaxError:
+        collectd.warning('fritzcollectd: Invalid data received, '
+                         'attempting to reconnect')
+        config.reconnect()
+    except IOError as error:
+        collectd.warning('fritzcollectd: Connection failed ({}), '
+                         'attempting to reconnect'.format(error))
+        config.reconnect()
 
 
 def callback_shutdown():
     """ Shutdown callback """
+    for config in CONFIGS:
+        config.shutdown()
+    RESPONSE_CACHE.clear()
     del CONFIGS[:]
 
 
 collectd.register_config(callback_configure)
 collectd.register_init(callback_init)
-collectd.register_read(callback_read)
 collectd.register_shutdown(callback_shutdown)
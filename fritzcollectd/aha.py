@@ -0,0 +1,142 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+# pylint: disable=c-extension-no-member
+
+""" fritzcollectd - AVM Home Automation HTTP Interface (AHA) """
+
+import binascii
+import hashlib
+
+import requests
+
+from lxml import etree
+
+EMPTY_SID = '0000000000000000'
+
+
+class AhaSession(object):
+    """ Reads all smart home devices with a single request
+
+        The devices are returned as readings in the same format as the
+        TR-064 action X_AVM-DE_Homeauto:1 GetGenericDeviceInfos returns them,
+        so that they can be converted and dispatched in the same way.
+    """
+
+    def __init__(self, address, user, password, timeout=None):
+        self._url = 'http://{}'.format(address)
+        self._user = user
+        self._password = password
+        self._session = requests.Session()
+        self._sid = None
+        self._timeout = timeout
+
+    def login(self):
+        """ Login and obtain a session id """
+        response = self._session.get(self._url + '/login_sid.lua',
+                                     params={'version': 2},
+                                     timeout=self._timeout)
+        response.raise_for_status()
+        challenge = etree.fromstring(response.content).findtext('Challenge')
+        response = self._session.get(
+            self._url + '/login_sid.lua',
+            params={'version': 2, 'username': self._user,
+                    'response': self._response(challenge)},
+            timeout=self._timeout)
+        response.raise_for_status()
+        sid = etree.fromstring(response.content).findtext('SID')
+        if sid == EMPTY_SID:
+            raise IOError("fritzcollectd: AHA login failed, incorrect "
+                          "password or 'Smart Home' rights for user disabled")
+        self._sid = sid
+
+    def _response(self, challenge):
+        """ Calculate the response for the login challenge """
+        password = self._password.encode('utf-8')
+        if challenge.startswith('2$'):
+            _, iter1, salt1, iter2, salt2 = challenge.split('$')
+            hash1 = hashlib.pbkdf2_hmac('sha256', password,
+                                        bytearray.fromhex(salt1), int(iter1))
+            hash2 = hashlib.pbkdf2_hmac('sha256', hash1,
+                                        bytearray.fromhex(salt2), int(iter2))
+            return '{}${}'.format(salt2,
+                                  binascii.hexlify(hash2).decode('ascii'))
+        text = u'{}-{}'.format(challenge, self._password)
+        return '{}-{}'.format(challenge, hashlib.md5(
+            text.encode('utf-16-le')).hexdigest())
+
+    def device_infos(self):
+        """ Read the list of all devices
+
+            Returns a list of readings dicts (one per device), the index of
+            the device in the list is stored as NewIndex.
+        """
+        if self._sid is None:
+            self.login()
+        response = self._get_device_list()
+        if response.status_code == 403:
+            # Session expired
+            self.login()
+            response = self._get_device_list()
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return parse_device_list(response.raw)
+
+    def close(self):
+        """ Close the connection """
+        self._session.close()
+
+    def _get_device_list(self):
+        return self._session.get(
+            self._url + '/webservices/homeautoswitch.lua',
+            params={'switchcmd': 'getdevicelistinfos', 'sid': self._sid},
+            stream=True, timeout=self._timeout)
+
+
+def parse_device_list(stream):
+    """ Parse the AHA device list incrementally
+
+        Every <device> element is converted and released as soon as it has
+        been parsed, so memory usage doesn't grow with the number of devices.
+        The units are converted to the ones used by TR-064.
+    """
+    devices = []
+    for _, element in etree.iterparse(stream, tag='device'):
+        readings = {'NewIndex': len(devices)}
+        power = element.findtext('powermeter/power')
+        if power:
+            # mW -> 1/100 W
+            readings['NewMultimeterPower'] = float(power) / 10
+        energy = element.findtext('powermeter/energy')
+        if energy:
+            readings['NewMultimeterEnergy'] = int(energy)
+        temperature = element.findtext('temperature/celsius')
+        if temperature:
+            readings['NewTemperatureCelsius'] = temperature
+        state = element.findtext('switch/state')
+        if state:
+            readings['NewSwitchState'] = 'ON' if state == '1' else 'OFF'
+        devices.append(readings)
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    return devices
@@ -0,0 +1,157 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - On-disk cache of the TR-064 service descriptions """
+
+import hashlib
+import json
+import os
+import re
+
+from fritzconnection import fritzconnection
+
+from lxml import etree
+
+
+class CachedFritzConnection(fritzconnection.FritzConnection):
+    """ FritzConnection that stores the parsed service descriptions on disk
+
+        Only the (small) device description files are downloaded on every
+        connect. They identify model and firmware version of the router. The
+        services and actions (normally parsed from one SCPD file per service)
+        are loaded from the cache unless the firmware changed.
+    """
+
+    def __init__(self, cache_dir, **kwargs):
+        self.cache_dir = cache_dir
+        self.cache_hit = False
+        self.cache_error = None
+        super(CachedFritzConnection, self).__init__(**kwargs)
+
+    def _read_descriptions(self, password):
+        """ Read the device descriptions and the services (from cache) """
+        descfiles = [fritzconnection.FRITZ_IGD_DESC_FILE]
+        if password:
+            descfiles.append(fritzconnection.FRITZ_TR64_DESC_FILE)
+        parsers = []
+        for descfile in descfiles:
+            try:
+                parsers.append(fritzconnection.FritzDescParser(
+                    self.address, self.port, descfile))
+            except IOError:
+                # Same as in FritzConnection: customized models might miss
+                # the igddesc.xml file.
+                continue
+        if not parsers:
+            return
+
+        self.modelname = parsers[0].get_modelname()
+        key = {'model': self.modelname,
+               'firmware': [self._get_firmware(parser) for parser in parsers]}
+        cached = self._load(key)
+        if cached is not None:
+            self._load_services(cached)
+            self.cache_hit = True
+            return
+
+        for parser in parsers:
+            self._read_services(parser.get_services())
+        self._save(key)
+
+    @staticmethod
+    def _get_firmware(parser):
+        """ Firmware version reported in the device description
+
+            igddesc.xml doesn't contain the firmware version, the hash of the
+            description is used instead.
+        """
+        display = parser.root.find('{}/{}'.format(
+            parser.nodename('systemVersion'), parser.nodename('Display')))
+        if display is not None:
+            return display.text
+        return hashlib.sha1(etree.tostring(parser.root)).hexdigest()
+
+    @property
+    def cache_file(self):
+        """ Path of the cache file for this router """
+        name = re.sub(r'[^\w.-]', '_', '{}_{}'.format(self.address, self.port))
+        return os.path.join(self.cache_dir, name + '.json')
+
+    def _load(self, key):
+        """ Return the cached services if the cache matches the key """
+        try:
+            with open(self.cache_file) as cache:
+                cached = json.load(cache)
+        except (IOError, OSError, ValueError):
+            return None
+        if cached.get('key') != key:
+            return None
+        return cached['services']
+
+    def _save(self, key):
+        """ Store the services (without any credentials) in the cache """
+        services = {
+            name: {
+                'service_type': service.service_type,
+                'service_id': service.service_id,
+                'control_url': service.control_url,
+                'scpd_url': service.scpd_url,
+                'actions': {
+                    action.name: {argument.name: [argument.direction,
+                                                  argument.data_type]
+                                  for argument in action.arguments.values()}
+                    for action in service.actions.values()
+                }
+            }
+            for name, service in self.services.items()
+        }
+        temp_file = self.cache_file + '.tmp'
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(temp_file, 'w') as cache:
+                json.dump({'key': key, 'services': services}, cache)
+            os.rename(temp_file, self.cache_file)
+        except (IOError, OSError) as error:
+            self.cache_error = error
+
+    def _load_services(self, services):
+        """ Recreate the service and action objects from the cache """
+        for name, data in services.items():
+            service = fritzconnection.FritzService(
+                data['service_type'], data['service_id'],
+                data['control_url'], data['scpd_url'])
+            for action_name, arguments in data['actions'].items():
+                action = fritzconnection.FritzAction(
+                    service.service_type, service.control_url,
+                    self.action_parameters)
+                action.name = action_name
+                for argument_name, (direction, data_type) \
+                        in arguments.items():
+                    argument = fritzconnection.FritzActionArgument()
+                    argument.name = argument_name
+                    argument.direction = direction
+                    argument.data_type = data_type
+                    action.arguments[argument_name] = argument
+                service.actions[action_name] = action
+            self.services[name] = service
@@ -0,0 +1,258 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Standalone exporter with a Prometheus endpoint
+
+    Runs the plugin without collectd: every router is read once per interval
+    and the last values are served over HTTP in the Prometheus text format.
+    Scrapes are answered from memory, so any number of scrapers (e.g. the
+    replicas of a Prometheus HA pair) can be served without calls to the
+    routers.
+
+    The routers are configured in a JSON file with a list of module blocks
+    (the same keys as in collectd's configuration, options with several
+    values as list)::
+
+        [{"Address": "fritz.box", "Password": "secret", "HostList": "True"}]
+"""
+
+import argparse
+import json
+import logging
+import re
+import signal
+import threading
+import time
+
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+import fritzcollectd
+
+from fritzcollectd import standalone
+
+# Data source names of the multi-value types dispatched by the plugin
+DATA_SOURCES = {'if_octets': ('rx', 'tx')}
+
+# Types of monotonic counters (DERIVE and COUNTER data sources in collectd's
+# types.db), exported as Prometheus counters
+COUNTER_TYPES = ('counter', 'derive', 'if_octets')
+
+# Value instances of gauge types that are monotonic counters as well (the
+# byte totals of the router)
+COUNTER_INSTANCES = re.compile(r'totalbytes')
+
+# Options the exporter overrides: the store drops the values that are not
+# dispatched anymore, so every read has to dispatch all known values (no
+# suppressed unchanged values, the last values of the tiers not polled)
+OVERRIDDEN_OPTIONS = {'SuppressUnchanged': '', 'TierRedispatch': 'True'}
+
+
+def metric(values):
+    """ Name and Prometheus type of the metric of the values """
+    name = 'fritzcollectd_' + re.sub(r'\W', '_', values.type)
+    if values.type in COUNTER_TYPES or \
+            COUNTER_INSTANCES.search(values.type_instance):
+        return name + '_total', 'counter'
+    return name, 'gauge'
+
+
+class MetricsStore(object):
+    """ Sink that keeps the last dispatched values
+
+        The values are rendered in the Prometheus text format, values that
+        haven't been dispatched for `expire` seconds (or two intervals of
+        the values, if longer) are dropped.
+    """
+
+    def __init__(self, expire):
+        self._expire = expire
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def __call__(self, values):
+        key = (values.type, values.host, values.plugin_instance,
+               values.type_instance)
+        with self._lock:
+            self._values[key] = values
+
+    def render(self, now=None):
+        """ Values in the Prometheus text format """
+        now = time.time() if now is None else now
+        metrics = {}
+        with self._lock:
+            for key, values in list(self._values.items()):
+                if now - values.time > max(self._expire,
+                                           2 * values.interval):
+                    del self._values[key]
+                    continue
+                metrics.setdefault(metric(values), []).append(values)
+        lines = []
+        for name, metric_type in sorted(metrics):
+            lines.append('# TYPE {} {}'.format(name, metric_type))
+            for values in sorted(metrics[(name, metric_type)],
+                                 key=lambda values: (
+                                     values.host, values.plugin_instance,
+                                     values.type_instance)):
+                labels = [('host', values.host),
+                          ('plugin_instance', values.plugin_instance),
+                          ('type_instance', values.type_instance)]
+                names = DATA_SOURCES.get(values.type, [])
+                for index, value in enumerate(values.values):
+                    if len(values.values) > 1:
+                        data_source = names[index] if index < len(names) \
+                            else str(index)
+                        value_labels = labels + [('ds', data_source)]
+                    else:
+                        value_labels = labels
+                    lines.append('{}{{{}}} {}'.format(name, ','.join(
+                        '{}="{}"'.format(label, escape(label_value))
+                        for label, label_value in value_labels),
+                        repr(float(value))))
+        return ''.join(line + '\n' for line in lines)
+
+
+def escape(value):
+    """ Escape a label value """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+class RequestHandler(WSGIRequestHandler):
+    """ Request handler that doesn't log every scrape """
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+class Exporter(object):
+    """ Reads the routers periodically and serves the values """
+
+    def __init__(self, modules, address='', port=9650, interval=10):
+        self._modules = modules
+        self._interval = interval
+        self._stop = threading.Event()
+        self._threads = []
+        self.store = MetricsStore(expire=3 * interval)
+        self._server = make_server(address, port, self.application,
+                                   handler_class=RequestHandler)
+
+    @property
+    def port(self):
+        """ Port the metrics are served on """
+        return self._server.server_address[1]
+
+    def application(self, environ, start_response):
+        """ WSGI application serving the metrics (rendered from the store,
+            scrapes never read the routers) """
+        if environ['PATH_INFO'] != '/metrics':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found\n']
+        body = self.store.render().encode('utf-8')
+        start_response('200 OK', [
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+            ('Content-Length', str(len(body)))])
+        return [body]
+
+    def start(self):
+        """ Configure the plugin, start reading and serving """
+        standalone.register_sink(self.store)
+        for module in self._modules:
+            for key, value in sorted(OVERRIDDEN_OPTIONS.items()):
+                if str(module.get(key, value)).lower() != value.lower():
+                    standalone.warning('fritzcollectd: {} is not supported '
+                                       'by the exporter, using "{}"'.format(
+                                           key, value))
+            module = dict(module, **OVERRIDDEN_OPTIONS)
+            fritzcollectd.callback_configure(standalone.Config(
+                'Module', ['fritzcollectd'], [
+                    standalone.Config(key, value if isinstance(value, list)
+                                      else [value])
+                    for key, value in module.items()]))
+        fritzcollectd.callback_init()
+        for router in fritzcollectd.CONFIGS:
+            self._start_thread(self._poll, router)
+        self._start_thread(self._server.serve_forever)
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def _poll(self, router):
+        """ Read a router every interval (like collectd's read threads) """
+        interval = router.interval or self._interval
+        router.wait_connected(interval)
+        while True:
+            start = time.time()
+            try:
+                fritzcollectd.callback_read(router)
+            except Exception:  # pylint: disable=broad-except
+                standalone.LOGGER.exception('fritzcollectd: Read failed')
+            if self._stop.wait(max(0, start + interval - time.time())):
+                return
+
+    def stop(self):
+        """ Stop reading and serving """
+        self._stop.set()
+        self._server.shutdown()
+        for thread in self._threads:
+            thread.join()
+        self._server.server_close()
+        fritzcollectd.callback_shutdown()
+        standalone.unregister_sink(self.store)
+
+
+def parse_args(argv):
+    """ Parse the command line """
+    parser = argparse.ArgumentParser(
+        description='Read FRITZ!Box routers and serve the values to '
+                    'Prometheus')
+    parser.add_argument('config', help='JSON file with the module blocks')
+    parser.add_argument('--listen', default=':9650', metavar='[ADDRESS]:PORT',
+                        help='address of the metrics endpoint (/metrics)')
+    parser.add_argument('--interval', type=float, default=10,
+                        help='read interval of routers without Interval')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log informational messages')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """ Run the exporter until it is terminated """
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s %(levelname)s %(message)s')
+    with open(args.config) as config:
+        modules = json.load(config)
+    address, _, port = args.listen.rpartition(':')
+    exporter = Exporter(modules, address, int(port), args.interval)
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    exporter.start()
+    while not stop.is_set():
+        # Signals only interrupt waits with a timeout on Python 2
+        stop.wait(1)
+    exporter.stop()
@@ -0,0 +1,88 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+# pylint: disable=c-extension-no-member
+
+""" fritzcollectd - Host list (X_AVM-DE_GetHostListPath) """
+
+import re
+from collections import OrderedDict
+
+import requests
+
+from lxml import etree
+
+# Names of the interface types used in the value instances
+INTERFACE_TYPES = {'802.11': 'wlan', '': 'unknown'}
+
+
+class HostList(object):
+    """ Downloads the host list document of the router
+
+        The document contains all known hosts (LAN, WLAN, ...), reading it
+        needs a single request instead of one GetGenericHostEntry call per
+        host.
+    """
+
+    def __init__(self, address, port, timeout=None):
+        self._url = 'http://{}:{}'.format(address, port)
+        self._session = requests.Session()
+        self._timeout = timeout
+
+    def statistics(self, path):
+        """ Download the host list from path and return its statistics """
+        response = self._session.get(self._url + path, stream=True,
+                                     timeout=self._timeout)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return parse_host_list(response.raw)
+
+    def close(self):
+        """ Close the connection """
+        self._session.close()
+
+
+def parse_host_list(stream):
+    """ Parse the host list incrementally and count the hosts
+
+        Every <Item> element is counted and released as soon as it has been
+        parsed, so memory usage doesn't grow with the number of hosts.
+        Returns a dict {value_instance: count} with the number of known,
+        active and active guest hosts as well as the number of active hosts
+        per interface type.
+    """
+    statistics = OrderedDict([('hosts', 0), ('hosts_active', 0),
+                              ('hosts_active_guest', 0)])
+    for _, element in etree.iterparse(stream, tag='Item'):
+        statistics['hosts'] += 1
+        if element.findtext('Active') == '1':
+            statistics['hosts_active'] += 1
+            if element.findtext('X_AVM-DE_Guest') == '1':
+                statistics['hosts_active_guest'] += 1
+            interface = element.findtext('InterfaceType') or ''
+            key = 'hosts_active_{}'.format(INTERFACE_TYPES.get(
+                interface, re.sub(r'\W', '', interface).lower()))
+            statistics[key] = statistics.get(key, 0) + 1
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    return statistics
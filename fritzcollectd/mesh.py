@@ -0,0 +1,64 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Mesh topology (X_AVM-DE_GetMeshListPath) """
+
+import re
+from collections import namedtuple
+
+import requests
+
+MeshNode = namedtuple('MeshNode', ['name', 'mac_address'])
+
+
+class MeshList(object):
+    """ Downloads the mesh topology document of the mesh master """
+
+    def __init__(self, address, port, timeout=None):
+        self._url = 'http://{}:{}'.format(address, port)
+        self._session = requests.Session()
+        self._timeout = timeout
+
+    def nodes(self, path):
+        """ Download the mesh list from path and return the mesh nodes """
+        response = self._session.get(self._url + path, timeout=self._timeout)
+        response.raise_for_status()
+        return parse_mesh_list(response.json())
+
+    def close(self):
+        """ Close the connection """
+        self._session.close()
+
+
+def parse_mesh_list(mesh_list):
+    """ Mesh nodes (repeaters, ...) of the mesh list document
+
+        The master itself and devices that are not meshed are skipped. The
+        node names are reduced to characters that are valid in plugin
+        instances.
+    """
+    return [MeshNode(re.sub(r'[^\w-]', '', node.get('device_name', '')) or
+                     node['device_mac_address'].replace(':', '').lower(),
+                     node['device_mac_address'])
+            for node in mesh_list.get('nodes', [])
+            if node.get('is_meshed') and node.get('mesh_role') == 'slave']
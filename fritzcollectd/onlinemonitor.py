@@ -0,0 +1,85 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+
+""" fritzcollectd - History of the online monitor (X_AVM-DE_GetOnlineMonitor)
+"""
+
+import math
+from collections import OrderedDict
+
+# The router samples the online monitor every 5 seconds.
+SAMPLE_INTERVAL = 5
+
+
+def parse_samples(text):
+    """ Parse a comma separated list of samples (newest first) """
+    return [int(sample) for sample in text.split(',') if sample]
+
+
+def aggregate(samples):
+    """ Aggregate the values of samples
+
+        Returns a dict {aggregation: value} with the minimum, maximum, mean
+        and 95th percentile (nearest rank).
+    """
+    ordered = sorted(samples)
+    rank = int(math.ceil(0.95 * len(ordered)))
+    return OrderedDict([('min', ordered[0]),
+                        ('max', ordered[-1]),
+                        ('mean', float(sum(ordered)) / len(ordered)),
+                        ('p95', ordered[rank - 1])])
+
+
+class OnlineMonitor(object):  # pylint: disable=too-few-public-methods
+    """ Returns the samples of the online monitor history that are new
+
+        Every call of X_AVM-DE_GetOnlineMonitor returns the last samples
+        (about 100 seconds), consecutive reads overlap. The router doesn't
+        report when the samples were taken, the newest sample is assumed to
+        be taken at the last multiple of SAMPLE_INTERVAL before the read so
+        that the samples of consecutive reads line up.
+    """
+
+    def __init__(self):
+        self._newest = None
+
+    def samples(self, readings, arguments, timestamp):
+        """ Samples of the arguments that weren't returned before
+
+            Returns a dict {argument: [(time, value), ...]}, oldest first.
+        """
+        newest = timestamp - timestamp % SAMPLE_INTERVAL
+        result = OrderedDict()
+        for argument in arguments:
+            if argument not in readings:
+                continue
+            samples = [(newest - index * SAMPLE_INTERVAL, value)
+                       for index, value
+                       in enumerate(parse_samples(readings[argument]))]
+            result[argument] = [(sample_time, value)
+                                for sample_time, value in reversed(samples)
+                                if self._newest is None
+                                or sample_time > self._newest]
+        self._newest = newest
+        return result
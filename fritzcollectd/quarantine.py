@@ -0,0 +1,84 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Quarantine of failing calls """
+
+import threading
+
+from timeit import default_timer
+
+
+class Quarantine(object):
+    """ Calls that keep failing and are skipped for a while
+
+        A call (service action and index) that fails `threshold` times in a
+        row is quarantined: it is skipped until its retry is due. The delay
+        doubles with every failed retry up to `max_delay` seconds, a
+        successful call releases the call from the quarantine.
+    """
+
+    def __init__(self, delay, max_delay, threshold=2):
+        self._delay = delay
+        self._max_delay = max_delay
+        self._threshold = threshold
+        self._lock = threading.Lock()
+        # {key: (consecutive failures, time of the next retry)}
+        self._failures = {}
+
+    def __len__(self):
+        """ Number of quarantined calls """
+        with self._lock:
+            return len([failures for failures, _ in self._failures.values()
+                        if failures >= self._threshold])
+
+    def skipped(self, key):
+        """ Whether the call is quarantined and its retry not yet due """
+        with self._lock:
+            _, retry_at = self._failures.get(key, (0, 0))
+        return default_timer() < retry_at
+
+    def failed(self, key):
+        """ Record a failed call
+
+            Returns the delay until the call is retried if it is
+            quarantined, None otherwise.
+        """
+        with self._lock:
+            failures = self._failures.get(key, (0, 0))[0] + 1
+            delay = None
+            retry_at = 0
+            if failures >= self._threshold:
+                delay = min(self._max_delay, self._delay *
+                            2 ** (failures - self._threshold))
+                retry_at = default_timer() + delay
+            self._failures[key] = (failures, retry_at)
+        return delay
+
+    def succeeded(self, key):
+        """ Record a successful call
+
+            Returns whether the call was quarantined before.
+        """
+        with self._lock:
+            failures, _ = self._failures.pop(key, (0, 0))
+        return failures >= self._threshold
@@ -0,0 +1,82 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+
+""" fritzcollectd - Process-wide cache of action responses """
+
+import copy
+import threading
+
+from concurrent.futures import Future
+from timeit import default_timer
+
+
+class ResponseCache(object):
+    """ Cache of action responses shared by all configured routers
+
+        Module blocks that read the same router call the same actions, the
+        responses are cached for a short time (TTL) so that every action is
+        called once per read. Concurrent calls with the same key wait for
+        the call in flight instead of calling again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, ttl, call):
+        """ Return the cached response of key or call and cache it
+
+            Failed calls are not cached, their exception is raised for all
+            callers waiting for it.
+        """
+        now = default_timer()
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None or (entry[0] <= now and entry[1].done())
+            if owner:
+                self._purge(now)
+                entry = (now + ttl, Future())
+                self._entries[key] = entry
+        future = entry[1]
+        if owner:
+            try:
+                future.set_result(call())
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+        # Callers may modify the response (e.g. add the index)
+        return copy.copy(future.result())
+
+    def _purge(self, now):
+        """ Remove the expired responses (called with the lock held) """
+        for key, (expires, future) in list(self._entries.items()):
+            if expires <= now and future.done():
+                del self._entries[key]
+
+    def clear(self):
+        """ Remove all cached responses """
+        with self._lock:
+            self._entries.clear()
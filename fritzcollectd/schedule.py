@@ -0,0 +1,80 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Adaptive read interval """
+
+from timeit import default_timer
+
+# Values that indicate activity on the link and of the devices
+ACTIVITY = ('sendrate', 'receiverate', 'power')
+
+
+class AdaptiveSchedule(object):
+    """ Read interval that follows the activity
+
+        The read callback is registered with the minimal interval, reads are
+        skipped until the current interval has passed. If an activity value
+        changed by more than `threshold` (relative to the highest value seen)
+        since the last read, the minimal interval is used. Otherwise the
+        interval doubles with every read up to the maximal interval.
+    """
+
+    def __init__(self, min_interval, max_interval, threshold):
+        self.interval = min_interval
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._threshold = threshold
+        self._last_read = None
+        self._last = {}
+        self._peaks = {}
+
+    def due(self):
+        """ Whether the current interval has passed since the last read """
+        now = default_timer()
+        # The callbacks are not called exactly every minimal interval
+        if self._last_read is not None and now < self._last_read + \
+                self.interval - self._min_interval / 2.0:
+            return False
+        self._last_read = now
+        return True
+
+    def update(self, values):
+        """ Adapt the interval to the activity values of a read
+
+            The values are in the format returned by the read:
+            {(plugin_instance, value_instance): (value_type, value)}
+        """
+        change = 0
+        for key, (_, value) in values.items():
+            if key[1] not in ACTIVITY or \
+                    not isinstance(value, (int, float)):
+                continue
+            peak = max(self._peaks.get(key, 0), abs(value))
+            self._peaks[key] = peak
+            if key in self._last and peak:
+                change = max(change, abs(value - self._last[key]) / peak)
+            self._last[key] = value
+        if change > self._threshold:
+            self.interval = self._min_interval
+        else:
+            self.interval = min(self._max_interval, self.interval * 2)
@@ -0,0 +1,91 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Persistent HTTP session for TR-064 actions """
+
+import functools
+
+from timeit import default_timer
+
+import fritzconnection
+import requests
+
+from requests.auth import HTTPDigestAuth
+
+
+class SoapSession(object):
+    """ Executes the actions of a FritzConnection over a persistent session
+
+        FritzAction.execute opens a new connection for every call and (with
+        a password) is answered with a 401 digest challenge first. This
+        session keeps the connections alive and reuses the digest nonce of
+        the previous call until the router rejects it as stale.
+    """
+
+    def __init__(self, user, password, pool_size=1, timeout=None):
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        if password:
+            self._session.auth = HTTPDigestAuth(user, password)
+        self.statistics = None
+        self._timeout = timeout
+
+    def attach(self, connection):
+        """ Route all actions of the connection through this session """
+        for service in connection.services.values():
+            for action in service.actions.values():
+                action.execute = functools.partial(self.execute, action)
+
+    def execute(self, action, **kwargs):
+        """ Replacement for FritzAction.execute """
+        headers = action.header.copy()
+        headers['soapaction'] = '%s#%s' % (action.service_type, action.name)
+        # pylint: disable=protected-access
+        body = action._body_builder(kwargs)
+        data = action.envelope.strip() % body
+        url = 'http://%s:%s%s' % (action.address, action.port,
+                                  action.control_url)
+        try:
+            response = self._session.post(url, data=data, headers=headers,
+                                          timeout=self._timeout)
+        except requests.ConnectionError:
+            # The router closed the idle connection, the actions that are
+            # read are free of side effects and can be sent again.
+            response = self._session.post(url, data=data, headers=headers,
+                                          timeout=self._timeout)
+        if response.status_code == 401:
+            raise fritzconnection.AuthorizationError('unauthorized request')
+        if self.statistics is None:
+            return action.parse_response(response.content)
+
+        start = default_timer()
+        result = action.parse_response(response.content)
+        self.statistics.add_response(len(response.content),
+                                     default_timer() - start)
+        return result
+
+    def close(self):
+        """ Close all connections """
+        self._session.close()
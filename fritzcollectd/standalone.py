@@ -0,0 +1,105 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Stand-in for the collectd module
+
+    Provides the part of collectd's Python API that the plugin uses when it
+    isn't loaded by collectd (see fritzcollectd.exporter): log messages go
+    to the logging module and dispatched values are passed to the
+    registered sinks.
+"""
+
+import copy
+import logging
+import socket
+
+LOGGER = logging.getLogger('fritzcollectd')
+
+# Callables that receive every dispatched Values
+SINKS = []
+
+
+def info(message):
+    """ Log an informational message """
+    LOGGER.info(message)
+
+
+def warning(message):
+    """ Log a warning """
+    LOGGER.warning(message)
+
+
+def error(message):
+    """ Log an error """
+    LOGGER.error(message)
+
+
+def register_sink(sink):
+    """ Pass the dispatched values to the sink (callable) """
+    SINKS.append(sink)
+
+
+def unregister_sink(sink):
+    """ Stop passing the dispatched values to the sink """
+    SINKS.remove(sink)
+
+
+def register_config(*_, **__):
+    """ The callbacks are called by the exporter """
+
+
+register_init = register_read = register_shutdown = register_config
+
+
+class Values(object):  # pylint: disable=too-few-public-methods
+    """ Value list as collectd.Values """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, **kwargs):
+        self.host = self.plugin = self.plugin_instance = ''
+        self.type = self.type_instance = ''
+        self.values = []
+        self.time = self.interval = 0
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def dispatch(self, **kwargs):
+        """ Pass a copy with the given attributes changed to the sinks """
+        values = copy.copy(self)
+        for key, value in kwargs.items():
+            setattr(values, key, value)
+        if not values.host:
+            # collectd uses its host name as well
+            values.host = socket.gethostname()
+        for sink in SINKS:
+            sink(values)
+
+
+class Config(object):  # pylint: disable=too-few-public-methods
+    """ Configuration node as passed to the config callback """
+
+    def __init__(self, key, values=(), children=()):
+        self.key = key
+        self.values = tuple(values)
+        self.children = tuple(children)
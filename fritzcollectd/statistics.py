@@ -0,0 +1,93 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Statistics about the plugin's own performance """
+
+import re
+import threading
+
+from collections import OrderedDict
+
+
+class ReadStatistics(object):
+    """ Measures where the time of a read is spent
+
+        The per read statistics are reset after every read, reconnects and
+        failures are counted for the lifetime of the plugin.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reconnects = 0
+        self.failures = 0
+        self.duration = 0.0
+        self.calls = 0
+        self.bytes_received = 0
+        self.parse_time = 0.0
+        self.unread = 0
+        self.failed_calls = 0
+        self.quarantined = 0
+        self.latencies = OrderedDict()
+
+    def reset(self):
+        """ Reset the per read statistics """
+        with self._lock:
+            self.duration = 0.0
+            self.calls = 0
+            self.bytes_received = 0
+            self.parse_time = 0.0
+            self.unread = 0
+            self.failed_calls = 0
+            self.latencies = OrderedDict()
+
+    def add_call(self, service, action, latency):
+        """ Record the latency of a call """
+        key = '{}-{}'.format(re.sub(r'[^\w-]', '', service), action)
+        with self._lock:
+            self.calls += 1
+            total, count = self.latencies.get(key, (0.0, 0))
+            self.latencies[key] = (total + latency, count + 1)
+
+    def add_response(self, size, parse_time):
+        """ Record size and parse time of a response """
+        with self._lock:
+            self.bytes_received += size
+            self.parse_time += parse_time
+
+    def values(self):
+        """ Statistics as list of (value_type, value_instance, value) """
+        with self._lock:
+            values = [('duration', 'read', self.duration),
+                      ('duration', 'parse', self.parse_time),
+                      ('count', 'calls', self.calls),
+                      ('count', 'unread', self.unread),
+                      ('count', 'failed_calls', self.failed_calls),
+                      ('count', 'quarantined', self.quarantined),
+                      ('bytes', 'received', self.bytes_received),
+                      ('derive', 'reconnects', self.reconnects),
+                      ('derive', 'failures', self.failures)]
+            values.extend(('response_time', key, total / count)
+                          for key, (total, count) in self.latencies.items())
+        return values
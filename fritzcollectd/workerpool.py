@@ -0,0 +1,74 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" fritzcollectd - Worker threads shared by all configured routers """
+
+import collections
+import threading
+
+from concurrent.futures import Future
+
+
+class WorkerPool(object):  # pylint: disable=too-few-public-methods
+    """ Runs functions on a bounded number of daemon threads
+
+        Threads are only started while functions are queued and end once
+        the queue is empty, so idle routers don't hold a thread. The threads
+        are daemon threads: a function blocking without timeout (e.g. the
+        description download of fritzconnection) doesn't hold up collectd's
+        shutdown.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._threads = 0
+
+    def submit(self, function, *args):
+        """ Queue a call of function, returns its future """
+        future = Future()
+        with self._lock:
+            self._queue.append((future, function, args))
+            if self._threads >= self.workers:
+                return future
+            self._threads += 1
+        thread = threading.Thread(target=self._work)
+        thread.daemon = True
+        thread.start()
+        return future
+
+    def _work(self):
+        """ Run the queued functions until the queue is empty """
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._threads -= 1
+                    return
+                future, function, args = self._queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args))
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
@@ -0,0 +1,152 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Tests for the fritzcollectd AHA HTTP interface """
+
+import io
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.aha import AhaSession, parse_device_list  # noqa, pylint: disable=wrong-import-order
+
+DEVICE_LIST = b"""<?xml version="1.0" encoding="utf-8"?>
+<devicelist version="1">
+  <device identifier="08761 0114116" id="16" functionbitmask="2944"
+          fwversion="03.87" manufacturer="AVM" productname="FRITZ!DECT 200">
+    <present>1</present>
+    <name>FRITZ!DECT 200 #1</name>
+    <switch><state>1</state><mode>auto</mode><lock>0</lock></switch>
+    <powermeter><power>16730</power><energy>5182</energy></powermeter>
+    <temperature><celsius>225</celsius><offset>0</offset></temperature>
+  </device>
+  <device identifier="09995 0335100" id="17" functionbitmask="320"
+          fwversion="03.54" manufacturer="AVM" productname="Comet DECT">
+    <present>1</present>
+    <name>Comet DECT #1</name>
+    <temperature><celsius>195</celsius><offset>0</offset></temperature>
+    <hkr><tist>39</tist><tsoll>40</tsoll></hkr>
+  </device>
+  <group identifier="900" id="900" functionbitmask="512">
+    <present>1</present>
+    <name>Group</name>
+    <switch><state>0</state></switch>
+  </group>
+  <device identifier="08761 0114117" id="18" functionbitmask="2944"
+          fwversion="03.87" manufacturer="AVM" productname="FRITZ!DECT 200">
+    <present>0</present>
+    <name>FRITZ!DECT 200 #2</name>
+    <switch><state></state></switch>
+    <powermeter><power></power><energy></energy></powermeter>
+  </device>
+</devicelist>
+"""
+
+SESSION_INFO = """<?xml version="1.0" encoding="utf-8"?>
+<SessionInfo><SID>{}</SID><Challenge>{}</Challenge></SessionInfo>
+"""
+
+
+def test_parse_device_list():
+    """ Devices are converted to TR-064 readings, groups are skipped. """
+    assert parse_device_list(io.BytesIO(DEVICE_LIST)) == [
+        {'NewIndex': 0, 'NewMultimeterPower': 1673.0,
+         'NewMultimeterEnergy': 5182, 'NewTemperatureCelsius': '225',
+         'NewSwitchState': 'ON'},
+        {'NewIndex': 1, 'NewTemperatureCelsius': '195'},
+        {'NewIndex': 2}]
+
+
+class FritzBoxMock(object):  # pylint: disable=too-few-public-methods
+    """ Mock for the HTTP interface of the router. """
+
+    def __init__(self, challenge, expected_response, sid='0123456789abcdef'):
+        self.challenge = challenge
+        self.expected_response = expected_response
+        self.sid = sid
+        self.expired = False
+        self.logins = 0
+
+    def get(self, url, params, **_):
+        """ Replacement for requests.Session.get """
+        response = mock.Mock()
+        if url.endswith('/login_sid.lua'):
+            sid = '0000000000000000'
+            if params.get('response') == self.expected_response:
+                self.logins += 1
+                sid = self.sid
+            response.content = SESSION_INFO.format(
+                sid, self.challenge).encode('utf-8')
+        elif self.expired or params['sid'] != self.sid:
+            self.expired = False
+            response.status_code = 403
+        else:
+            response.status_code = 200
+            response.raw = io.BytesIO(DEVICE_LIST)
+        return response
+
+
+@pytest.mark.parametrize('challenge, password, expected_response', [
+    # Examples from AVM's "Session-IDs im FRITZ!Box Webinterface"
+    ('1234567z', u'\xe4bc', '1234567z-9e224a41eeefa284df7bb0f26c2913e2'),
+    ('2$10000$5A1711$2000$5A1722', '1example!',
+     '5A1722$1798a1672bca7c6463d6b245f82b53703b0f50813401b03e4045a5861e689adb')
+])
+def test_device_infos(mocker, challenge, password, expected_response):
+    """ Login (MD5 and PBKDF2) and read the device list. """
+    fritzbox = FritzBoxMock(challenge, expected_response)
+    mocker.patch('requests.Session').return_value.get.side_effect = \
+        fritzbox.get
+    session = AhaSession('fritz.box', 'user', password)
+    assert len(session.device_infos()) == 3
+    assert len(session.device_infos()) == 3
+    assert fritzbox.logins == 1
+    session.close()
+
+
+def test_device_infos_session_expired(mocker):
+    """ Login again if the session expired. """
+    fritzbox = FritzBoxMock('1234567z',
+                            '1234567z-9e224a41eeefa284df7bb0f26c2913e2')
+    mocker.patch('requests.Session').return_value.get.side_effect = \
+        fritzbox.get
+    session = AhaSession('fritz.box', 'user', u'\xe4bc')
+    session.device_infos()
+    fritzbox.expired = True
+    assert len(session.device_infos()) == 3
+    assert fritzbox.logins == 2
+
+
+def test_login_failed(mocker):
+    """ Incorrect passwords are reported. """
+    fritzbox = FritzBoxMock('1234567z', 'invalid')
+    mocker.patch('requests.Session').return_value.get.side_effect = \
+        fritzbox.get
+    with pytest.raises(IOError):
+        AhaSession('fritz.box', 'user', 'password').device_infos()
@@ -0,0 +1,187 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+# pylint: disable=c-extension-no-member
+
+""" Tests for the fritzcollectd service descriptions cache """
+
+import io
+import os
+
+import pytest
+
+from lxml import etree
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.descriptioncache import CachedFritzConnection  # noqa, pylint: disable=wrong-import-order
+
+DESCRIPTION = """<?xml version="1.0"?>
+<root xmlns="urn:dslforum-org:device-1-0">
+  {system_version}
+  <device>
+    <modelName>FRITZ!Box 7490</modelName>
+    <serviceList>
+      <service>
+        <serviceType>urn:dslforum-org:service:DeviceInfo:1</serviceType>
+        <serviceId>urn:DeviceInfo-com:serviceId:DeviceInfo1</serviceId>
+        <controlURL>/upnp/control/deviceinfo</controlURL>
+        <SCPDURL>/deviceinfoSCPD.xml</SCPDURL>
+      </service>
+    </serviceList>
+  </device>
+</root>
+"""
+
+PARSE = etree.parse
+
+SYSTEM_VERSION = """<systemVersion><Display>{}</Display></systemVersion>"""
+
+SCPD = """<?xml version="1.0"?>
+<scpd xmlns="urn:dslforum-org:service-1-0">
+  <actionList>
+    <action>
+      <name>GetInfo</name>
+      <argumentList>
+        <argument>
+          <name>NewUpTime</name>
+          <direction>out</direction>
+          <relatedStateVariable>UpTime</relatedStateVariable>
+        </argument>
+      </argumentList>
+    </action>
+  </actionList>
+  <serviceStateTable>
+    <stateVariable>
+      <name>UpTime</name>
+      <dataType>ui4</dataType>
+    </stateVariable>
+  </serviceStateTable>
+</scpd>
+"""
+
+
+class FritzBoxFiles(object):  # pylint: disable=too-few-public-methods
+    """ Serves the description files instead of a real router and records
+        which files were downloaded. """
+
+    def __init__(self):
+        self.firmware = '113.07.12'
+        self.downloads = []
+
+    def parse(self, source):
+        """ Replacement for lxml.etree.parse """
+        filename = source.rsplit('/', 1)[-1]
+        self.downloads.append(filename)
+        if filename == 'igddesc.xml':
+            content = DESCRIPTION.format(system_version='')
+        elif filename == 'tr64desc.xml':
+            content = DESCRIPTION.format(
+                system_version=SYSTEM_VERSION.format(self.firmware))
+        else:
+            content = SCPD
+        return PARSE(io.BytesIO(content.encode('utf-8')))
+
+
+# pylint: disable=redefined-outer-name
+
+@pytest.fixture()
+def fritzbox(mocker):
+    """ Fixture that replaces the router's description files. """
+    files = FritzBoxFiles()
+    mocker.patch('fritzconnection.fritzconnection.etree.parse',
+                 side_effect=files.parse)
+    yield files
+
+
+def _connect(cache_dir, password='password'):
+    return CachedFritzConnection(str(cache_dir), address='fritz.box',
+                                 port=49000, user='user', password=password)
+
+
+@pytest.mark.parametrize('password', ['password', ''])
+def test_cache(fritzbox, tmpdir, password):
+    """ The second connection uses the cached services. """
+    connection = _connect(tmpdir, password)
+    assert not connection.cache_hit
+    assert 'deviceinfoSCPD.xml' in fritzbox.downloads
+
+    del fritzbox.downloads[:]
+    cached = _connect(tmpdir, password)
+    assert cached.cache_hit
+    assert 'deviceinfoSCPD.xml' not in fritzbox.downloads
+    assert cached.modelname == connection.modelname
+    assert cached.actionnames == connection.actionnames
+    assert cached.get_action_arguments('DeviceInfo:1', 'GetInfo') == \
+        connection.get_action_arguments('DeviceInfo:1', 'GetInfo')
+    action = cached.services['DeviceInfo:1'].actions['GetInfo']
+    assert action.password == password
+    assert action.control_url == '/upnp/control/deviceinfo'
+
+
+def test_cache_firmware_update(fritzbox, tmpdir):
+    """ The cache is invalidated when the firmware changes. """
+    _connect(tmpdir)
+    fritzbox.firmware = '113.07.19'
+    assert not _connect(tmpdir).cache_hit
+    assert _connect(tmpdir).cache_hit
+
+
+def test_cache_without_credentials(fritzbox, tmpdir):
+    """ The password is not stored in the cache. """
+    connection = _connect(tmpdir)
+    assert fritzbox.downloads
+    with open(connection.cache_file) as cache:
+        assert 'password' not in cache.read()
+
+
+def test_cache_corrupt(fritzbox, tmpdir):
+    """ A corrupt cache file is ignored and replaced. """
+    tmpdir.join('fritz.box_49000.json').write('{')
+    assert not _connect(tmpdir).cache_hit
+    assert fritzbox.downloads
+    assert _connect(tmpdir).cache_hit
+
+
+def test_cache_not_writable(fritzbox, tmpdir):
+    """ A cache directory that can't be created is reported. """
+    tmpdir.join('file').write('')
+    connection = _connect(tmpdir.join('file'))
+    assert connection.cache_error is not None
+    assert connection.actionnames
+    assert fritzbox.downloads
+
+
+def test_cache_created(fritzbox, tmpdir):
+    """ The cache directory is created if it doesn't exist. """
+    connection = _connect(tmpdir.join('cache'))
+    assert os.path.isfile(connection.cache_file)
+    assert fritzbox.downloads
+
+
+def test_cache_description_missing(mocker, tmpdir):
+    """ Routers without description files behave as FritzConnection. """
+    mocker.patch('fritzconnection.fritzconnection.etree.parse',
+                 side_effect=IOError)
+    connection = _connect(tmpdir)
+    assert connection.modelname is None
+    assert not connection.cache_hit
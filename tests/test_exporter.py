@@ -0,0 +1,237 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+
+""" Tests for the fritzcollectd standalone exporter """
+
+import json
+import sys
+import threading
+import time
+
+try:
+    from importlib import reload
+except ImportError:  # Python 2
+    pass
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:  # Python 2
+    from urllib2 import urlopen, HTTPError
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK, CollectdValues  # noqa, pylint: disable=unused-import
+from fritzcollectd import exporter, standalone  # noqa, pylint: disable=wrong-import-order
+import fritzcollectd  # noqa, pylint: disable=wrong-import-order
+
+
+# pylint: disable=redefined-outer-name
+
+@pytest.fixture()
+def standalone_mock(mocker):
+    """ Dispatch the values of the plugin to the stand-in's sinks. """
+    mocker.patch('fritzcollectd.collectd', standalone)
+    mocker.patch('fritzconnection.FritzConnection', autospec=True) \
+        .return_value = mock.Mock(**{
+            'modelname': 'FRITZ!Box 7490',
+            'services': {},
+            'actionnames': [('WANIPConn:1', 'GetStatusInfo')],
+            'call_action.return_value': {'NewConnectionStatus': 'Connected',
+                                         'NewUptime': 35307}})
+
+
+def values(**kwargs):
+    """ Dispatched values """
+    result = standalone.Values(host='box', plugin='fritzbox', type='gauge',
+                               values=[1], time=1000)
+    for key, value in kwargs.items():
+        setattr(result, key, value)
+    return result
+
+
+def test_standalone_import():
+    """ Without collectd the plugin uses the stand-in. """
+    sys.modules['collectd'] = None
+    try:
+        reload(fritzcollectd)
+        assert fritzcollectd.collectd is standalone
+    finally:
+        sys.modules['collectd'] = MOCK
+        reload(fritzcollectd)
+    assert fritzcollectd.collectd is MOCK
+
+
+def test_standalone_values(mocker):
+    """ Dispatched values are passed to the sinks (with the host name). """
+    mocker.patch('socket.gethostname', return_value='collector')
+    sink = mock.Mock()
+    standalone.register_sink(sink)
+    standalone.register_read(sink, interval=10)
+    template = standalone.Values(plugin='fritzbox', type='uptime')
+    template.dispatch(values=[1], time=1000)
+    standalone.unregister_sink(sink)
+    template.dispatch(values=[2], time=1010)
+    dispatched = sink.call_args[0][0]
+    assert sink.call_count == 1
+    assert (dispatched.host, dispatched.values, template.values) == (
+        'collector', [1], [])
+
+
+def test_standalone_logging(mocker):
+    """ Log messages go to the logging module. """
+    logger = mocker.patch.object(standalone, 'LOGGER')
+    standalone.info('info')
+    standalone.warning('warning')
+    standalone.error('error')
+    logger.info.assert_called_once_with('info')
+    logger.warning.assert_called_once_with('warning')
+    logger.error.assert_called_once_with('error')
+
+
+def test_render():
+    """ Values are rendered in the Prometheus text format. """
+    store = exporter.MetricsStore(expire=30)
+    store(values(plugin_instance='1', type_instance='constatus'))
+    store(values(type='if_octets', type_instance='wan', values=[1, 2]))
+    store(values(type='ping', type_instance='a"b', values=[1, 2.5]))
+    store(values(type_instance='old', time=900))
+    store(values(type_instance='slow', time=900, interval=60))
+    store(values(type='derive', plugin_instance='self',
+                 type_instance='failures'))
+    store(values(type='bytes', type_instance='totalbytessent'))
+    store(values(type='bytes', plugin_instance='self',
+                 type_instance='received'))
+    assert store.render(now=1010) == (
+        '# TYPE fritzcollectd_bytes gauge\n'
+        'fritzcollectd_bytes{host="box",plugin_instance="self",'
+        'type_instance="received"} 1.0\n'
+        '# TYPE fritzcollectd_bytes_total counter\n'
+        'fritzcollectd_bytes_total{host="box",plugin_instance="",'
+        'type_instance="totalbytessent"} 1.0\n'
+        '# TYPE fritzcollectd_derive_total counter\n'
+        'fritzcollectd_derive_total{host="box",plugin_instance="self",'
+        'type_instance="failures"} 1.0\n'
+        '# TYPE fritzcollectd_gauge gauge\n'
+        'fritzcollectd_gauge{host="box",plugin_instance="",'
+        'type_instance="slow"} 1.0\n'
+        'fritzcollectd_gauge{host="box",plugin_instance="1",'
+        'type_instance="constatus"} 1.0\n'
+        '# TYPE fritzcollectd_if_octets_total counter\n'
+        'fritzcollectd_if_octets_total{host="box",plugin_instance="",'
+        'type_instance="wan",ds="rx"} 1.0\n'
+        'fritzcollectd_if_octets_total{host="box",plugin_instance="",'
+        'type_instance="wan",ds="tx"} 2.0\n'
+        '# TYPE fritzcollectd_ping gauge\n'
+        'fritzcollectd_ping{host="box",plugin_instance="",'
+        'type_instance="a\\"b",ds="0"} 1.0\n'
+        'fritzcollectd_ping{host="box",plugin_instance="",'
+        'type_instance="a\\"b",ds="1"} 2.5\n')
+
+
+@pytest.mark.usefixtures('standalone_mock')
+def test_exporter():
+    """ The routers are read periodically, scrapes are served from the
+        store without reading the routers. """
+    instance = exporter.Exporter([{'Instance': 'box', 'Collect': ['*']}],
+                                 '127.0.0.1', 0, interval=0.05)
+    instance.start()
+    try:
+        url = 'http://127.0.0.1:{}/metrics'.format(instance.port)
+        for _ in range(100):
+            if 'uptime' in urlopen(url).read().decode('utf-8'):
+                break
+            time.sleep(0.05)
+        body = urlopen(url).read().decode('utf-8')
+        assert 'fritzcollectd_uptime{host=' in body
+        assert 'plugin_instance="box",type_instance="uptime"} 35307.0' in body
+        with pytest.raises(HTTPError):
+            urlopen(url + 'x')
+    finally:
+        instance.stop()
+    assert not standalone.SINKS
+    assert not fritzcollectd.CONFIGS
+
+
+@pytest.mark.usefixtures('standalone_mock')
+def test_exporter_overridden_options(mocker):
+    """ Options that leave values out of reads are overridden, so that the
+        values don't expire between their reads. """
+    warning = mocker.patch.object(standalone.LOGGER, 'warning')
+    configure = mocker.patch('fritzcollectd.callback_configure')
+    mocker.patch('fritzcollectd.callback_init')
+    instance = exporter.Exporter([{'SuppressUnchanged': 'gauge',
+                                   'TierRedispatch': 'False'},
+                                  {'TierRedispatch': 'true'}],
+                                 '127.0.0.1', 0)
+    instance.start()
+    instance.stop()
+    assert warning.call_count == 2
+    for call in configure.call_args_list:
+        options = {node.key: list(node.values)
+                   for node in call[0][0].children}
+        assert options['SuppressUnchanged'] == ['']
+        assert options['TierRedispatch'] == ['True']
+
+
+@pytest.mark.usefixtures('standalone_mock')
+def test_exporter_read_failure(mocker):
+    """ Failing reads are logged and the router is read again. """
+    read = mocker.patch('fritzcollectd.callback_read',
+                        side_effect=RuntimeError())
+    logger = mocker.patch.object(standalone.LOGGER, 'exception')
+    instance = exporter.Exporter([{}], '127.0.0.1', 0, interval=0.01)
+    instance.start()
+    try:
+        for _ in range(100):
+            if read.call_count > 1:
+                break
+            time.sleep(0.05)
+    finally:
+        instance.stop()
+    assert read.call_count > 1
+    assert logger.called
+
+
+def test_main(mocker, tmpdir):
+    """ The exporter runs until it is terminated. """
+    config = tmpdir.join('routers.json')
+    config.write(json.dumps([{'Address': 'fritz.box'}]))
+    exporter_class = mocker.patch('fritzcollectd.exporter.Exporter')
+    handlers = []
+    mocker.patch('signal.signal',
+                 side_effect=lambda signum, handler: handlers.append(handler))
+    exporter_class.return_value.start.side_effect = \
+        lambda: threading.Timer(0.05, handlers[-1]).start()
+    exporter.main([str(config), '--listen', '127.0.0.1:9999',
+                   '--verbose'])
+    exporter_class.assert_called_once_with([{'Address': 'fritz.box'}],
+                                           '127.0.0.1', 9999, 10)
+    assert exporter_class.return_value.stop.called
@@ -20,13 +20,20 @@
 # SOFTWARE.
 
 # pylint: disable=bad-option-value,useless-object-inheritance
+# pylint: disable=too-many-lines
 
 """ Tests for fritzcollectd """
 
 from __future__ import print_function
 
 import collections
+import copy
+import itertools
 import sys
+import threading
+import time
+
+from concurrent.futures import Future
 
 try:
     import mock
@@ -38,6 +45,7 @@ import pytest
 from lxml.etree import XMLSyntaxError  # pylint: disable=no-name-in-module
 
 import fritzconnection
+import requests
 
 
 class CollectdMock(object):
@@ -48,7 +56,7 @@ class CollectdMock(object):
     def __init__(self):
         self._cb_config = None
         self._cb_init = None
-        self._cb_read = None
+        self.read_callbacks = []
         self._cb_shutdown = None
         self.values = []
         self.info = mock.Mock()
@@ -70,33 +78,49 @@ class CollectdMock(object):
             callback is called when a plugin is loaded. """
         self._cb_init = cb_init
 
-    def register_read(self, cb_read):
+    def register_read(self, cb_read, interval=None, data=None, name=None):
         """ Plugins are required to register a read callback. The callback is
             called periodically to read data. """
-        self._cb_read = cb_read
+        self.read_callbacks.append((cb_read, interval, data, name))
+
+    def read(self):
+        """ Simulates collectd's read threads. Call all read callbacks. """
+        for cb_read, _, data, _ in self.read_callbacks:
+            if data is None:
+                cb_read()
+            else:
+                cb_read(data)
 
     def register_shutdown(self, cb_shutdown):
         """ Plugins can register a shutdown callback. The callback is called
             when collectd shuts down. """
         self._cb_shutdown = cb_shutdown
 
-    def process(self, config=None):
-        """ Simulates collectd. Call callbacks once. """
+    def process(self, config=None, reads=1):
+        """ Simulates collectd. Call callbacks once (read callbacks `reads`
+            times). A list of configs simulates multiple module blocks. """
         if config is None:
             config = CollectdConfig()
+        configs = config if isinstance(config, list) else [config]
         try:
-            self._cb_config(config)
+            for module_config in configs:
+                self._cb_config(module_config)
             self._cb_init()
-            self._cb_read()
+            # The routers are connected in the background.
+            for router in fritzcollectd.CONFIGS:
+                router.wait_connected()
+            for _ in range(reads):
+                self.read()
         finally:
             # Make sure read also can be called if init failed before.
-            self._cb_read()
+            self.read()
             self._cb_shutdown()
+            del self.read_callbacks[:]
 
-    def Values(self):  # pylint: disable=invalid-name
+    def Values(self, **kwargs):  # pylint: disable=invalid-name
         """ Plugins call this in their read callback in order to report
             measurements to collectd. """
-        return CollectdValues(self)
+        return CollectdValues(self, **kwargs)
 
 
 class CollectdConfig(object):  # pylint: disable=too-few-public-methods
@@ -115,14 +139,18 @@ class CollectdConfig(object):  # pylint: disable=too-few-public-methods
     def children(self):
         """ Property passed to the collectd configuration callback. """
         node = collections.namedtuple('Node', ['key', 'values'])
-        return [node(key=k, values=[v]) for k, v in self._config.items()]
+        return [node(key=k, values=v if isinstance(v, list) else [v])
+                for k, v in self._config.items()]
 
 
 class CollectdValues(object):  # pylint: disable=too-few-public-methods
     """ Represents a container class in which plugins can report
         measurements to collectd. """
 
-    def __init__(self, collectd_mock):
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, collectd_mock, **kwargs):
+        self.time = 0
         self.host = ''
         self.plugin = ''
         self.plugin_instance = ''
@@ -130,14 +158,18 @@ class CollectdValues(object):  # pylint: disable=too-few-public-methods
         self.type_instance = ''
         self.values = []
         self._collectd_mock = collectd_mock
+        self.__dict__.update(kwargs)
 
     def __repr__(self):
         return 'Values({}, {}, {})'.format(
             self.type, self.type_instance, self.values[0])
 
-    def dispatch(self):
-        """ Dispatch measurements to collectd. """
-        self._collectd_mock.values.append(self)
+    def dispatch(self, **kwargs):
+        """ Dispatch measurements to collectd. The arguments override the
+            members for this dispatch only. """
+        values = copy.copy(self)
+        values.__dict__.update(kwargs)
+        self._collectd_mock.values.append(values)
 
 
 class FritzConnectionMock(object):  # pylint: disable=too-few-public-methods
@@ -162,7 +194,11 @@ class FritzConnectionMock(object):  # pylint: disable=too-few-public-methods
          'NewTotalBytesReceived': 5221019883},
         ('LANEthernetInterfaceConfig:1', 'GetStatistics'):
         {'NewBytesSent': 23004321,
-         'NewBytesReceived': 12045}
+         'NewBytesReceived': 12045},
+        ('Hosts:1', 'X_AVM-DE_GetHostListPath'):
+        {'NewX_AVM-DE_HostListPath': '/devicehostlist.lua?sid=1234'},
+        ('Hosts:1', 'X_AVM-DE_GetMeshListPath'):
+        {'NewX_AVM-DE_MeshListPath': '/meshlist.lua?sid=1234'}
     }
     FRITZBOX_DATA_INDEXED = {
         ('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos'):
@@ -195,21 +231,39 @@ class FritzConnectionMock(object):  # pylint: disable=too-few-public-methods
           'NewHkrIsEnabled': 'DISABLED',
           'NewHkrSetTemperature': '0',
           'NewTemperatureCelsius': '225',
-          'NewHkrIsValid': 'INVALID'}, {}]
+          'NewHkrIsValid': 'INVALID'}, {}],
+        ('WANCommonInterfaceConfig:1', 'X_AVM-DE_GetOnlineMonitor'):
+        [{'NewTotalNumberSyncGroups': 1,
+          'NewSyncGroupName': 'sync_dsl',
+          'NewSyncGroupMode': 'VDSL',
+          'Newmax_ds': 12500000,
+          'Newmax_us': 5000000,
+          'Newds_current_bps': '5000,4000,1000',
+          'Newmc_current_bps': '0,0,0',
+          'Newus_current_bps': '500,400,100',
+          'Newprio_realtime_bps': '0,0,0',
+          'Newprio_high_bps': '0,0,0',
+          'Newprio_default_bps': '500,400,100',
+          'Newprio_low_bps': '0,0,0'}]
     }
 
     MODELNAME = 'FRITZ!Box 7490'
 
+    # Attributes of the CachedFritzConnection
+    cache_hit = False
+    cache_error = None
+
     def __init__(self):
         type(self).modelname = mock.PropertyMock(return_value=self.MODELNAME)
         self.call_action = mock.Mock(side_effect=self._side_effect_callaction)
         type(self).actionnames = mock.PropertyMock(
             side_effect=self._side_effect_actionnames)
         services = {
-            srv: None for srv, _ in list(self.FRITZBOX_DATA.keys())
+            srv: mock.Mock(actions={})
+            for srv, _ in list(self.FRITZBOX_DATA.keys())
             + list(self.FRITZBOX_DATA_INDEXED.keys())
         }
-        type(self).services = mock.PropertyMock(side_effect=[services])
+        type(self).services = mock.PropertyMock(return_value=services)
 
     def _side_effect_callaction(self, service, action, **kwargs):
         if kwargs:
@@ -274,9 +328,745 @@ def test_unsupported_service(fc_class_mock):
     """ Ensure unsupported service actions cause no issues. """
     config = CollectdConfig({'Password': 'password', 'Verbose': 'True'})
 
-    del fc_class_mock.return_value.FRITZBOX_DATA[
+    fc_mock = fc_class_mock.return_value
+    fc_mock.FRITZBOX_DATA = dict(  # pylint: disable=invalid-name
+        fc_mock.FRITZBOX_DATA)
+    del fc_mock.FRITZBOX_DATA[
         ('LANEthernetInterfaceConfig:1', 'GetStatistics')]
     MOCK.process(config)
+    assert MOCK.values
+    assert 'lan_totalbytessent' not in [value.type_instance
+                                        for value in MOCK.values]
+
+
+def test_mixed_models(fc_class_mock):
+    """ Test that a service action unsupported by one router is still read
+        from the other routers. """
+    fc_mock = fc_class_mock.return_value
+    actionnames = fc_mock.actionnames
+    # The routers are initialized one after another
+    type(fc_mock).actionnames = mock.PropertyMock(side_effect=[
+        [name for name in actionnames
+         if name != ('LANEthernetInterfaceConfig:1', 'GetStatistics')],
+        actionnames])
+    MOCK.process([CollectdConfig({'Instance': 'first'}),
+                  CollectdConfig({'Instance': 'second'})])
+    assert {value.plugin_instance for value in MOCK.values
+            if value.type_instance == 'lan_totalbytessent'} == {'second'}
+
+
+@pytest.mark.usefixtures('fc_class_mock')
+def test_multiple_routers():
+    """ Test that multiple routers are read in parallel. """
+    MOCK.process([CollectdConfig({'Instance': 'first'}),
+                  CollectdConfig({'Instance': 'second'})])
+    plugin_instances = {value.plugin_instance for value in MOCK.values}
+    assert 'first' in plugin_instances
+    assert 'second' in plugin_instances
+
+
+def test_read_callbacks():
+    """ Test that every router registers its own read callback. """
+    configs = [CollectdConfig({'Instance': 'first', 'Interval': 5}),
+               CollectdConfig({'Address': 'localhost'})]
+    for config in configs:
+        fritzcollectd.callback_configure(config)
+    try:
+        callbacks = [(interval, name)
+                     for _, interval, _, name in MOCK.read_callbacks]
+        assert callbacks == [(5.0, 'fritzcollectd-169.254.1.1-first'),
+                             (None, 'fritzcollectd-localhost')]
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+
+
+def test_parallel_actions(fc_class_mock):
+    """ Test that parallel reads produce the same values in the same order
+        as serial reads. """
+    MOCK.process()
+    serial = [(value.plugin_instance, value.type_instance, value.values)
+              for value in MOCK.values]
+    MOCK.reset_mock()
+
+    fc_class_mock.return_value = FritzConnectionMock()
+    MOCK.process(CollectdConfig({'ParallelActions': 4}))
+    parallel = [(value.plugin_instance, value.type_instance, value.values)
+                for value in MOCK.values]
+    assert serial == parallel
+
+
+@pytest.mark.parametrize('redispatch, dispatched',
+                         [('True', 2), ('False', 1)])
+def test_tiers(fc_class_mock, redispatch, dispatched):
+    """ Test that slow service actions are only polled every n-th read. """
+    MOCK.process(CollectdConfig({'TierFast': 1, 'TierNormal': 1,
+                                 'TierSlow': 2,
+                                 'TierRedispatch': redispatch}))
+    calls = fc_class_mock.return_value.call_action.call_args_list
+    assert calls.count(mock.call('WANCommonIFC:1',
+                                 'GetCommonLinkProperties')) == 1
+    assert calls.count(mock.call('WANCommonIFC:1', 'GetAddonInfos')) == 2
+    assert [value.type_instance for value in MOCK.values].count(
+        'dslstatus') == dispatched
+
+
+@pytest.mark.parametrize('key', ['TierSlow', 'MeshRefresh'])
+def test_read_counts_invalid(fc_class_mock, mocker, key):
+    """ Test that read counts below 1 are ignored instead of breaking
+        reads. """
+    mocker.patch('fritzcollectd.mesh.MeshList').return_value.nodes \
+        .return_value = []
+    MOCK.process(CollectdConfig({key: 0, 'Mesh': 'True'}))
+    assert '{} must be at least 1'.format(key) in str(
+        MOCK.warning.call_args_list)
+    calls = fc_class_mock.return_value.call_action.call_args_list
+    assert calls.count(mock.call('WANCommonIFC:1',
+                                 'GetCommonLinkProperties')) == 2
+
+
+@pytest.mark.parametrize('cache_hit, cache_error', [(True, None),
+                                                    (False, IOError())])
+def test_cache_dir(mocker, cache_hit, cache_error):
+    """ Test that the service descriptions cache is used if configured. """
+    fc_mock = FritzConnectionMock()
+    fc_mock.cache_hit = cache_hit
+    fc_mock.cache_error = cache_error
+    cached_class_mock = mocker.patch(
+        'fritzcollectd.descriptioncache.CachedFritzConnection',
+        return_value=fc_mock)
+    MOCK.process(CollectdConfig({'CacheDir': '/cache', 'Verbose': 'True'}))
+    assert cached_class_mock.call_args[0] == ('/cache',)
+    assert MOCK.warning.called == (cache_error is not None)
+    assert MOCK.values
+
+
+@pytest.mark.parametrize('device_refresh, calls', [(60, 3), (1, 4)])
+def test_device_discovery(fc_class_mock, device_refresh, calls):
+    """ Test that DECT devices are only discovered periodically. """
+    MOCK.process(CollectdConfig({'DeviceRefresh': device_refresh}))
+    call_args = fc_class_mock.return_value.call_action.call_args_list
+    assert [args for args in call_args
+            if args[0][0] == 'X_AVM-DE_Homeauto:1'] == [
+                mock.call('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos',
+                          NewIndex=index)
+                for index in [0, 1, 0, 1][:calls]]
+    assert [value.plugin_instance for value in MOCK.values].count(
+        'dect0') == 8
+
+
+def test_device_removed(fc_class_mock):
+    """ Test that DECT devices are discovered again if one disappeared. """
+    fc_mock = fc_class_mock.return_value
+    device = fc_mock.FRITZBOX_DATA_INDEXED[
+        ('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos')][0]
+    # 1. read: discovery of 2 devices, 2. read: 2nd device disappeared,
+    # 3. read: discovery of 1 device, 4. read: read known device
+    devices = iter([device, device, {}, device, {}, device, {}, device])
+    side_effect = fc_mock.call_action.side_effect
+
+    def call_action(service, action, **kwargs):
+        if service == 'X_AVM-DE_Homeauto:1':
+            return dict(next(devices))
+        return side_effect(service, action, **kwargs)
+    fc_mock.call_action.side_effect = call_action
+
+    MOCK.process(reads=3)
+    indices = [args[1]['NewIndex']
+               for args in fc_mock.call_action.call_args_list
+               if args[0][0] == 'X_AVM-DE_Homeauto:1']
+    assert indices == [0, 1, 2, 0, 1, 0, 1, 0]
+
+
+def test_homeauto_backend_aha(fc_class_mock, mocker):
+    """ Test that the AHA backend produces the same DECT values as TR-064. """
+    MOCK.process()
+    expected = [(value.plugin_instance, value.type, value.type_instance,
+                 value.values) for value in MOCK.values]
+    MOCK.reset_mock()
+
+    aha_class_mock = mocker.patch('fritzcollectd.aha.AhaSession')
+    aha_class_mock.return_value.device_infos.return_value = [
+        {'NewIndex': 0, 'NewMultimeterPower': 1673.0,
+         'NewMultimeterEnergy': 5182, 'NewTemperatureCelsius': '225',
+         'NewSwitchState': 'ON'}]
+    fc_class_mock.return_value = FritzConnectionMock()
+    MOCK.process(CollectdConfig({'HomeautoBackend': 'AHA',
+                                 'Verbose': 'True'}))
+    assert [(value.plugin_instance, value.type, value.type_instance,
+             value.values) for value in MOCK.values] == expected
+    assert not [args for args
+                in fc_class_mock.return_value.call_action.call_args_list
+                if args[0][0] == 'X_AVM-DE_Homeauto:1']
+
+
+@pytest.mark.usefixtures('fc_class_mock')
+def test_self_stats():
+    """ Test that the plugin's own statistics are dispatched. """
+    MOCK.process(CollectdConfig({'Instance': 'instance', 'SelfStats': 'True'}))
+    stats = {(value.type, value.type_instance): value.values[0]
+             for value in MOCK.values
+             if value.plugin_instance == 'instance-self'}
+    assert stats[('count', 'calls')] == 5
+    assert stats[('derive', 'failures')] == 0
+    assert ('response_time', 'WANCommonIFC1-GetAddonInfos') in stats
+    assert ('response_time',
+            'X_AVM-DE_Homeauto1-GetGenericDeviceInfos') in stats
+    assert stats[('duration', 'read')] > 0
+
+
+def test_self_stats_failures(fc_class_mock):
+    """ Test that failed reads and reconnects are counted. """
+    errors = []
+
+    def call_action(service, action, **kwargs):
+        if errors:
+            raise errors.pop()
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_class_mock.return_value.call_action.side_effect = call_action
+
+    fritzcollectd.callback_configure(CollectdConfig({'SelfStats': 'True'}))
+    config = fritzcollectd.CONFIGS[0]
+    try:
+        fritzcollectd.callback_init()
+        assert config.wait_connected()
+        errors.append(XMLSyntaxError(0, 0, 0, 0))
+        fritzcollectd.callback_read(config)  # Fails, reconnects
+        assert not MOCK.values
+        assert config.wait_connected()
+        fritzcollectd.callback_read(config)
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+    stats = {(value.type, value.type_instance): value.values[0]
+             for value in MOCK.values if value.plugin_instance == 'self'}
+    assert stats[('derive', 'failures')] == 1
+    assert stats[('derive', 'reconnects')] == 1
+
+
+def test_self_stats_aha(mocker):
+    """ Test that the AHA request is measured. """
+    mocker.patch('fritzconnection.FritzConnection',
+                 return_value=FritzConnectionMock())
+    mocker.patch('fritzcollectd.aha.AhaSession').return_value.device_infos \
+        .return_value = []
+    MOCK.process(CollectdConfig({'HomeautoBackend': 'aha',
+                                 'SelfStats': 'True'}))
+    assert 'aha-getdevicelistinfos' in [value.type_instance
+                                        for value in MOCK.values]
+
+
+def test_read_timeout(fc_class_mock):
+    """ Test that the values read in time are dispatched if a call times
+        out and that the timeout doesn't cause a reconnect. """
+    def call_action(service, action, **kwargs):
+        if action == 'GetAddonInfos' or kwargs.get('NewIndex') == 1:
+            raise requests.exceptions.ReadTimeout()
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_class_mock.return_value.call_action.side_effect = call_action
+    MOCK.process(CollectdConfig({'Timeout': 1, 'SelfStats': 'True'}))
+    assert fc_class_mock.call_count == 1
+    assert MOCK.warning.called
+    stats = {(value.type, value.type_instance): value.values[0]
+             for value in MOCK.values if value.plugin_instance == 'self'}
+    assert stats[('count', 'unread')] == 1
+    instances = [value.type_instance for value in MOCK.values]
+    assert 'totalbytesreceived' not in instances
+    assert 'dslstatus' in instances
+    assert 'power' in instances
+
+
+@pytest.mark.parametrize('error', [
+    fritzconnection.AuthorizationError(0, 0, 0, 0), None])
+def test_read_failed_calls(fc_class_mock, error):
+    """ Test that failed calls (missing rights, empty responses) are reported
+        separately from the values not read in time. """
+    def call_action(service, action, **kwargs):
+        if action == 'GetAddonInfos':
+            if error is not None:
+                raise error
+            return {}
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_class_mock.return_value.call_action.side_effect = call_action
+    MOCK.process(CollectdConfig({'SelfStats': 'True'}))
+    stats = {(value.type, value.type_instance): value.values[0]
+             for value in MOCK.values if value.plugin_instance == 'self'}
+    assert stats[('count', 'unread')] == 0
+    assert stats[('count', 'failed_calls')] == 1
+    warnings = str(MOCK.warning.call_args_list)
+    assert 'Failed to read values of' in warnings
+    assert 'GetAddonInfos' in warnings
+    assert 'not read in time' not in warnings
+
+
+@pytest.mark.parametrize('parallel_actions', [1, 4])
+def test_read_deadline(fc_class_mock, mocker, parallel_actions):
+    """ Test that no calls are made after the deadline has passed. """
+    mocker.patch('fritzcollectd.default_timer',
+                 side_effect=itertools.count(step=10))
+    MOCK.process(CollectdConfig({'ReadDeadline': 15,
+                                 'ParallelActions': parallel_actions}))
+    assert fc_class_mock.return_value.call_action.call_count < 7
+    assert MOCK.warning.called
+
+
+def test_read_deadline_indexed(fc_class_mock, mocker):
+    """ Test that the devices read before the deadline are dispatched. """
+    fc_mock = fc_class_mock.return_value
+    mocker.patch('fritzcollectd.default_timer', side_effect=lambda: 100 * int(
+        mock.call('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos', NewIndex=0)
+        in fc_mock.call_action.call_args_list))
+    MOCK.process(CollectdConfig({'ReadDeadline': 15}), reads=0)
+    assert 'power' in [value.type_instance for value in MOCK.values]
+    assert fc_mock.call_action.call_args_list.count(
+        mock.call('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos',
+                  NewIndex=1)) == 0
+
+
+def test_read_deadline_parallel(fc_class_mock):
+    """ Test that a hanging call doesn't hold back the other values. """
+    def call_action(service, action, **kwargs):
+        if action == 'GetAddonInfos':
+            time.sleep(0.5)
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_class_mock.return_value.call_action.side_effect = call_action
+    MOCK.process(CollectdConfig({'ReadDeadline': 0.1,
+                                 'ParallelActions': 4}), reads=0)
+    instances = [value.type_instance for value in MOCK.values]
+    assert 'totalbytesreceived' not in instances
+    assert 'dslstatus' in instances
+
+
+@pytest.mark.parametrize('error', [
+    requests.exceptions.ReadTimeout(), requests.exceptions.ConnectionError(),
+    IOError('AHA login failed'), XMLSyntaxError(0, 0, 0, 0)])
+def test_read_failed_aha(mocker, error):
+    """ Test that a failed AHA request doesn't cause a reconnect, that only
+        the devices are not read and that the failures are tracked. """
+    fc_class_mock = mocker.patch('fritzconnection.FritzConnection',
+                                 return_value=FritzConnectionMock())
+    aha_mock = mocker.patch('fritzcollectd.aha.AhaSession').return_value
+    aha_mock.device_infos.side_effect = error
+    MOCK.process(CollectdConfig({'HomeautoBackend': 'aha'}), reads=2)
+    assert fc_class_mock.call_count == 1
+    instances = [value.type_instance for value in MOCK.values]
+    assert 'power' not in instances
+    assert instances.count('dslstatus') == 3
+    assert 'keeps failing' in str(MOCK.warning.call_args_list)
+    assert aha_mock.close.called
+
+
+@pytest.mark.parametrize('mode, dispatched', [
+    ('Off', {}),
+    ('Aggregate', {'monitor_receiverate_min': [(1000, 8000)] * 2,
+                   'monitor_receiverate_max': [(1000, 40000)] * 2,
+                   'monitor_receiverate_mean': [(1000, 80000 / 3.0)] * 2,
+                   'monitor_receiverate_p95': [(1000, 40000)] * 2,
+                   'monitor_sendrate_max': [(1000, 4000)] * 2}),
+    ('Samples', {'monitor_receiverate': [(990, 8000), (995, 32000),
+                                         (1000, 40000)],
+                 'monitor_sendrate': [(990, 800), (995, 3200),
+                                      (1000, 4000)]})])
+def test_online_monitor(fc_class_mock, mocker, mode, dispatched):
+    """ Test that the online monitor history is read and that the samples
+        are dispatched once (the aggregates are dispatched again like all
+        values of a tier that is not due). """
+    mocker.patch('time.time', return_value=1000)
+    MOCK.process(CollectdConfig({'OnlineMonitor': mode, 'SelfStats': 'True',
+                                 'TierNormal': 2}), reads=2)
+    values = collections.defaultdict(list)
+    for value in MOCK.values:
+        if value.type_instance.startswith('monitor_'):
+            values[value.type_instance].append((value.time, value.values[0]))
+    assert all(values[key] == dispatched[key] for key in dispatched)
+    assert bool(values) == bool(dispatched)
+    calls = fc_class_mock.return_value.call_action.call_args_list
+    assert calls.count(mock.call(
+        'WANCommonInterfaceConfig:1', 'X_AVM-DE_GetOnlineMonitor',
+        NewSyncGroupIndex=0)) == (2 if dispatched else 0)
+
+
+def test_online_monitor_timeout(fc_class_mock):
+    """ Test that a timeout of the online monitor leaves it unread. """
+    def call_action(service, action, **kwargs):
+        if action == 'X_AVM-DE_GetOnlineMonitor':
+            raise requests.exceptions.ReadTimeout()
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_class_mock.return_value.call_action.side_effect = call_action
+    MOCK.process(CollectdConfig({'OnlineMonitor': 'Samples'}))
+    assert fc_class_mock.call_count == 1
+    assert MOCK.warning.called
+    assert MOCK.values
+
+
+@pytest.mark.parametrize('host_list, calls, dispatched',
+                         [('False', 0, 0), ('True', 2, 3)])
+def test_host_list(fc_class_mock, mocker, host_list, calls, dispatched):
+    """ Test that the host statistics are read on their own schedule. """
+    host_list_mock = mocker.patch('fritzcollectd.hosts.HostList').return_value
+    host_list_mock.statistics.return_value = collections.OrderedDict(
+        [('hosts', 4), ('hosts_active', 3)])
+    MOCK.process(CollectdConfig({'HostList': host_list, 'TierHosts': 2,
+                                 'SelfStats': 'True'}), reads=2)
+    assert fc_class_mock.return_value.call_action.call_args_list.count(
+        mock.call('Hosts:1', 'X_AVM-DE_GetHostListPath')) == calls
+    assert host_list_mock.statistics.call_count == calls
+    values = [(value.type, value.type_instance, value.values[0])
+              for value in MOCK.values if value.plugin_instance == '']
+    assert values.count(('count', 'hosts_active', 3)) == dispatched
+    if calls:
+        host_list_mock.statistics.assert_called_with(
+            '/devicehostlist.lua?sid=1234')
+
+
+@pytest.mark.parametrize('error, readings', [
+    (None, {}),
+    (requests.exceptions.HTTPError('403 Client Error: Forbidden'), None),
+    (XMLSyntaxError(0, 0, 0, 0), None)])
+def test_host_list_failed(fc_class_mock, mocker, error, readings):
+    """ Test that an error response or a failed download of the host list
+        doesn't cause a reconnect and only leaves the hosts unread. """
+    fc_mock = fc_class_mock.return_value
+    fc_mock.FRITZBOX_DATA = dict(  # pylint: disable=invalid-name
+        fc_mock.FRITZBOX_DATA)
+    if readings is not None:
+        fc_mock.FRITZBOX_DATA[('Hosts:1', 'X_AVM-DE_GetHostListPath')] = \
+            readings
+    host_list_mock = mocker.patch('fritzcollectd.hosts.HostList').return_value
+    host_list_mock.statistics.side_effect = error
+    MOCK.process(CollectdConfig({'HostList': 'True'}))
+    assert fc_class_mock.call_count == 1
+    instances = [value.type_instance for value in MOCK.values]
+    assert 'hosts' not in instances
+    assert instances.count('dslstatus') == 2
+    assert 'Failed to read the host list' in str(MOCK.warning.call_args_list)
+
+
+@pytest.mark.usefixtures('fc_class_mock')
+def test_value_templates(mocker):
+    """ Test that the collectd.Values are only created once per value. """
+    values = mocker.spy(MOCK, 'Values')
+    mocker.patch('time.time', side_effect=[1, 2, 3])
+    MOCK.process(CollectdConfig({'SelfStats': 'True'}), reads=2)
+    dispatched = {(value.plugin_instance, value.type, value.type_instance)
+                  for value in MOCK.values}
+    assert len(MOCK.values) == 3 * len(dispatched)
+    assert values.call_count == len(dispatched)
+    assert {value.time for value in MOCK.values} == {1, 2, 3}
+
+
+@pytest.mark.usefixtures('fc_class_mock')
+def test_combine_values():
+    """ Test that received and sent bytes are dispatched as if_octets. """
+    MOCK.process(CollectdConfig({'CombineValues': 'True'}))
+    values = {(value.type, value.type_instance): value.values
+              for value in MOCK.values}
+    assert values[('if_octets', 'wan')] == [5221019883, 1712232562]
+    assert values[('if_octets', 'lan')] == [12045, 23004321]
+    assert ('bytes', 'totalbytessent') not in values
+    assert ('bitrate', 'sendrate') in values
+
+
+@pytest.mark.parametrize('suppress, constatus, uptime', [
+    ('gauge', [1], [1, 2, 3]),
+    ('gauge:2', [1, 3], [1, 2, 3]),
+    ('gauge, uptime', [1], [1]),
+    ('', [1, 2, 3], [1, 2, 3])])
+@pytest.mark.usefixtures('fc_class_mock')
+def test_suppress_unchanged(mocker, suppress, constatus, uptime):
+    """ Test that unchanged values are only dispatched after the heartbeat.
+    """
+    mocker.patch('time.time', side_effect=[1, 2, 3])
+    MOCK.process(CollectdConfig({'SuppressUnchanged': suppress,
+                                 'SuppressHeartbeat': 5}), reads=2)
+    times = collections.defaultdict(list)
+    for value in MOCK.values:
+        times[value.type_instance].append(value.time)
+    assert times['constatus'] == constatus
+    assert times['uptime'] == uptime
+
+
+@pytest.mark.parametrize('ttl, calls', [(0, 2), (60, 1)])
+def test_response_cache(fc_class_mock, ttl, calls):
+    """ Test that module blocks reading the same router share responses. """
+    MOCK.process([CollectdConfig({'Instance': 'first',
+                                  'ResponseCacheTTL': ttl}),
+                  CollectdConfig({'Instance': 'second',
+                                  'ResponseCacheTTL': ttl})], reads=0)
+    assert fc_class_mock.return_value.call_action.call_args_list.count(
+        mock.call('WANCommonIFC:1', 'GetAddonInfos')) == calls
+    assert [value.plugin_instance for value in MOCK.values
+            if value.type_instance == 'totalbytessent'] == ['first', 'second']
+
+
+def test_response_cache_alias(fc_class_mock):
+    """ Test that equivalent service actions are called once. """
+    fc_mock = fc_class_mock.return_value
+    type(fc_mock).actionnames = mock.PropertyMock(
+        return_value=fc_mock.actionnames + [
+            ('WANCommonInterfaceConfig:1', 'GetCommonLinkProperties')])
+    MOCK.process(CollectdConfig({'ResponseCacheTTL': 60}), reads=0)
+    values = {value.type_instance: value.values[0] for value in MOCK.values}
+    assert values['linkdownstreammax'] == values['downstreammax']
+
+
+@pytest.mark.parametrize('config, called, dispatched', [
+    ({'Ignore': 'X_AVM-DE_Homeauto:1/*'},
+     ['GetAddonInfos', 'GetStatistics'], ['totalbytessent', 'constatus']),
+    ({'Collect': ['totalbytes*', 'LANEthernetInterfaceConfig:1/*']},
+     ['GetAddonInfos', 'GetStatistics'],
+     ['totalbytessent', 'lan_totalbytessent']),
+    ({'Collect': '*', 'Ignore': ['power', 'energy', 'temperature',
+                                 'switchstate']},
+     ['GetAddonInfos', 'GetStatistics'], ['totalbytessent', 'constatus'])])
+def test_collect_ignore(fc_class_mock, config, called, dispatched):
+    """ Test that only the selected values are read and dispatched. """
+    MOCK.process(CollectdConfig(config))
+    actions = {call[0][1] for call
+               in fc_class_mock.return_value.call_action.call_args_list}
+    assert 'GetGenericDeviceInfos' not in actions
+    assert set(called) <= actions
+    instances = {value.type_instance for value in MOCK.values}
+    assert set(dispatched) <= instances
+    assert 'power' not in instances
+    if 'Collect' in config and config['Collect'] != '*':
+        assert instances == {'totalbytessent', 'totalbytesreceived',
+                             'lan_totalbytessent', 'lan_totalbytesreceived'}
+
+
+@pytest.mark.parametrize('config, dispatched', [
+    ({'HostList': 'True', 'Collect': 'hosts_active*'},
+     {'hosts_active', 'hosts_active_wlan'}),
+    ({'OnlineMonitor': 'Aggregate', 'Collect': 'monitor_*_p95'},
+     {'monitor_receiverate_p95', 'monitor_sendrate_p95'}),
+    ({'OnlineMonitor': 'Samples', 'Collect': 'monitor_sendrate'},
+     {'monitor_sendrate'}),
+    ({'CombineValues': 'True', 'Collect': 'wan'}, {'wan'}),
+    ({'HostList': 'True', 'Collect': 'hosts_active',
+      'Ignore': 'Hosts:1/*'}, set())])
+def test_collect_ignore_derived(fc_class_mock, mocker, config, dispatched):
+    """ Test that values whose instance is only known once they are read
+        (host statistics, online monitor, combined values) are selected. """
+    mocker.patch('fritzcollectd.hosts.HostList').return_value.statistics \
+        .return_value = collections.OrderedDict(
+            [('hosts', 4), ('hosts_active', 3), ('hosts_active_wlan', 1)])
+    MOCK.process(CollectdConfig(config), reads=0)
+    assert {value.type_instance for value in MOCK.values} == dispatched
+    assert (mock.call('Hosts:1', 'X_AVM-DE_GetHostListPath') in
+            fc_class_mock.return_value.call_action.call_args_list) == \
+        ('hosts_active' in dispatched)
+
+
+def test_adaptive_interval(fc_class_mock, mocker):
+    """ Test that reads are skipped while the activity is flat, that the
+        minimal interval is used when it changes and that the values are
+        dispatched with the interval until the next read. """
+    timer = mocker.patch('fritzcollectd.schedule.default_timer')
+    fc_mock = fc_class_mock.return_value
+    send_rates = iter([3438, 3438, 3438, 30000, 30000])
+
+    def call_action(service, action, **kwargs):
+        readings = FritzConnectionMock().call_action(service, action,
+                                                     **kwargs)
+        if action == 'GetAddonInfos':
+            readings = dict(readings, NewByteSendRate=next(send_rates))
+        return readings
+    fc_mock.call_action.side_effect = call_action
+
+    fritzcollectd.callback_configure(CollectdConfig({'MinInterval': 10,
+                                                     'MaxInterval': 40}))
+    config = fritzcollectd.CONFIGS[0]
+    try:
+        assert MOCK.read_callbacks[0][1] == 10
+        fritzcollectd.callback_init()
+        assert config.wait_connected()
+        for now in range(0, 120, 10):
+            timer.return_value = now
+            fritzcollectd.callback_read(config)
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+    assert [value.interval for value in MOCK.values
+            if value.type_instance == 'sendrate'] == [20, 40, 40, 10, 20]
+
+
+def test_mesh(fc_class_mock, mocker):
+    """ Test that the mesh nodes are read along with the router, that nodes
+        that leave the mesh or change their address are replaced and that the
+        known nodes are kept if the mesh list cannot be read. """
+    mesh_list = mocker.patch('fritzcollectd.mesh.MeshList').return_value
+    repeater = fritzcollectd.mesh.MeshNode('Repeater', '00:11:22:33:44:57')
+    kitchen = fritzcollectd.mesh.MeshNode('Kitchen', '00:11:22:33:44:58')
+    mesh_list.nodes.side_effect = [
+        [repeater, kitchen,
+         fritzcollectd.mesh.MeshNode('Attic', '00:11:22:33:44:59')],
+        requests.exceptions.ConnectionError('refused'), [repeater, kitchen]]
+    fc_mock = fc_class_mock.return_value
+    # The repeater gets a new address
+    addresses = iter(['192.168.178.57', '192.168.178.58', '192.168.178.59',
+                      '192.168.178.60', '192.168.178.58'])
+
+    def call_action(service, action, **kwargs):
+        if action == 'GetSpecificHostEntry':
+            return {'NewIPAddress': next(addresses)}
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_mock.call_action.side_effect = call_action
+
+    fritzcollectd.callback_configure(CollectdConfig({
+        'Mesh': 'True', 'MeshRefresh': 2, 'Instance': 'box'}))
+    config = fritzcollectd.CONFIGS[0]
+    instances = []
+    try:
+        fritzcollectd.callback_init()
+        for _ in range(6):
+            assert config.wait_connected()
+            del MOCK.values[:]
+            fritzcollectd.callback_read(config)
+            instances.append({value.plugin_instance for value in MOCK.values
+                              if 'dect' not in value.plugin_instance})
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+    mesh_list.nodes.assert_called_with('/meshlist.lua?sid=1234')
+    assert mesh_list.nodes.call_count == 3
+    assert mesh_list.close.called
+    assert MOCK.warning.call_count == 1
+    # The nodes are read once they are connected (from the first read on
+    # at the latest).
+    assert instances[1:4] == 3 * [{'box', 'box-Repeater', 'box-Kitchen',
+                                   'box-Attic'}]
+    assert instances[5] == {'box', 'box-Repeater', 'box-Kitchen'}
+    assert [call[1]['address'] for call in fc_class_mock.call_args_list] \
+        == ['169.254.1.1', '192.168.178.57', '192.168.178.58',
+            '192.168.178.59', '192.168.178.60']
+
+
+def test_mesh_failures(fc_class_mock, mocker):
+    """ Test that the router is still read if the mesh list fails for any
+        reason and that failed node reads are reported. """
+    mesh_list = mocker.patch('fritzcollectd.mesh.MeshList').return_value
+    mesh_list.nodes.return_value = [
+        fritzcollectd.mesh.MeshNode('Repeater', '00:11:22:33:44:57')]
+    fc_mock = fc_class_mock.return_value
+    errors = [fritzconnection.AuthorizationError(0, 0, 0, 0)]
+
+    def call_action(service, action, **kwargs):
+        if action == 'X_AVM-DE_GetMeshListPath' and errors:
+            raise errors.pop()
+        if action == 'GetSpecificHostEntry':
+            return {'NewIPAddress': '192.168.178.57'}
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_mock.call_action.side_effect = call_action
+
+    fritzcollectd.callback_configure(CollectdConfig({
+        'Mesh': 'True', 'MeshRefresh': 2}))
+    config = fritzcollectd.CONFIGS[0]
+    try:
+        fritzcollectd.callback_init()
+        assert config.wait_connected()
+        fritzcollectd.callback_read(config)
+        assert 'Failed to read the mesh' in str(MOCK.warning.call_args_list)
+        assert MOCK.values
+        fritzcollectd.callback_read(config)
+        assert not mesh_list.nodes.called
+        fritzcollectd.callback_read(config)
+        assert mesh_list.nodes.called
+        assert config.wait_connected()
+        # pylint: disable=protected-access
+        for _, node in config._mesh_nodes.values():
+            node.read = mock.Mock(side_effect=RuntimeError('boom'))
+        fritzcollectd.callback_read(config)
+        assert 'Failed to read mesh node 192.168.178.57' in str(
+            MOCK.warning.call_args_list)
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+
+
+def test_mesh_unsupported(fc_class_mock, mocker):
+    """ Test that the mesh list is not read from routers without mesh. """
+    mesh_list = mocker.patch('fritzcollectd.mesh.MeshList').return_value
+    fc_mock = fc_class_mock.return_value
+    fc_mock.FRITZBOX_DATA = dict(  # pylint: disable=invalid-name
+        fc_mock.FRITZBOX_DATA)
+    del fc_mock.FRITZBOX_DATA[('Hosts:1', 'X_AVM-DE_GetMeshListPath')]
+    MOCK.process(CollectdConfig({'Mesh': 'True'}), reads=2)
+    assert MOCK.values
+    assert not mesh_list.nodes.called
+
+
+def test_quarantine(fc_class_mock, mocker):
+    """ Test that calls that keep failing are skipped until their retry is
+        due and that a successful retry releases them. """
+    timer = mocker.patch('fritzcollectd.quarantine.default_timer',
+                         return_value=0)
+    fc_mock = fc_class_mock.return_value
+    failing = threading.Event()
+    failing.set()
+
+    def call_action(service, action, **kwargs):
+        if failing.is_set() and action == 'GetStatistics':
+            raise fritzconnection.AuthorizationError(0, 0, 0, 0)
+        if failing.is_set() and kwargs.get('NewIndex') == 0:
+            raise requests.exceptions.ReadTimeout()
+        return FritzConnectionMock().call_action(service, action, **kwargs)
+    fc_mock.call_action.side_effect = call_action
+
+    def calls(*args, **kwargs):
+        return fc_mock.call_action.call_args_list.count(
+            mock.call(*args, **kwargs))
+
+    fritzcollectd.callback_configure(CollectdConfig({'SelfStats': 'True'}))
+    config = fritzcollectd.CONFIGS[0]
+    try:
+        fritzcollectd.callback_init()
+        assert config.wait_connected()
+        for _ in range(4):
+            fritzcollectd.callback_read(config)
+        assert calls('LANEthernetInterfaceConfig:1', 'GetStatistics') == 2
+        assert calls('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos',
+                     NewIndex=0) == 2
+        # The devices after the quarantined one are still read.
+        assert calls('X_AVM-DE_Homeauto:1', 'GetGenericDeviceInfos',
+                     NewIndex=1) == 1
+        assert [value.values[0] for value in MOCK.values
+                if value.type_instance == 'quarantined'][-1] == 2
+        assert MOCK.warning.called
+
+        failing.clear()
+        timer.return_value = 60
+        fritzcollectd.callback_read(config)
+        assert calls('LANEthernetInterfaceConfig:1', 'GetStatistics') == 3
+        assert 'lan_totalbytessent' in [value.type_instance
+                                        for value in MOCK.values]
+        assert MOCK.info.called
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+
+
+def test_quarantine_nothing_new(fc_class_mock, mocker):
+    """ Test that reads without new values (no new online monitor samples,
+        no smart home devices) are not quarantined. """
+    mocker.patch('fritzcollectd.aha.AhaSession').return_value.device_infos \
+        .return_value = []
+    MOCK.process(CollectdConfig({'OnlineMonitor': 'Aggregate',
+                                 'HomeautoBackend': 'aha'}), reads=3)
+    assert 'keeps failing' not in str(MOCK.warning.call_args_list)
+    assert fc_class_mock.return_value.call_action.call_args_list.count(
+        mock.call('WANCommonInterfaceConfig:1', 'X_AVM-DE_GetOnlineMonitor',
+                  NewSyncGroupIndex=0)) == 4
+
+
+def test_quarantine_disabled(fc_class_mock):
+    """ Test that failing calls are always called with QuarantineDelay 0. """
+    fc_mock = fc_class_mock.return_value
+    fc_mock.call_action.side_effect = lambda service, action, **kwargs: \
+        FritzConnectionMock().call_action(service, action, **kwargs) \
+        if action != 'GetStatistics' else {}
+    MOCK.process(CollectdConfig({'QuarantineDelay': 0}), reads=3)
+    assert fc_mock.call_action.call_args_list.count(
+        mock.call('LANEthernetInterfaceConfig:1', 'GetStatistics')) == 4
 
 
 @pytest.mark.usefixtures('fc_class_mock')
@@ -294,8 +1084,9 @@ def test_connection_error(fc_class_mock):
     fc_mock = FritzConnectionMock()
     fc_class_mock.return_value = fc_mock
     type(fc_mock).modelname = mock.PropertyMock(return_value=None)
-    with pytest.raises(IOError):
-        MOCK.process()
+    MOCK.process()
+    assert MOCK.warning.called
+    assert not MOCK.values
 
 
 def test_applicationaccess_disabled(fc_class_mock):
@@ -303,8 +1094,9 @@ def test_applicationaccess_disabled(fc_class_mock):
     fc_mock = FritzConnectionMock()
     fc_class_mock.return_value = fc_mock
     type(fc_mock).services = mock.PropertyMock(return_value={})
-    with pytest.raises(IOError):
-        MOCK.process(CollectdConfig({'Password': 'password'}))
+    MOCK.process(CollectdConfig({'Password': 'password'}))
+    assert MOCK.warning.called
+    assert not MOCK.values
 
 
 def test_upnp_status_disabled(fc_class_mock):
@@ -312,8 +1104,9 @@ def test_upnp_status_disabled(fc_class_mock):
     fc_mock = FritzConnectionMock()
     fc_class_mock.return_value = fc_mock
     fc_mock.call_action.side_effect = [{}]
-    with pytest.raises(IOError):
-        MOCK.process()
+    MOCK.process()
+    assert MOCK.warning.called
+    assert not MOCK.values
 
 
 def test_incorrect_password(fc_class_mock):
@@ -322,8 +1115,9 @@ def test_incorrect_password(fc_class_mock):
     fc_class_mock.return_value = fc_mock
     fc_mock.call_action.side_effect = [
         {0}, fritzconnection.AuthorizationError(0, 0, 0, 0)]
-    with pytest.raises(IOError):
-        MOCK.process(CollectdConfig({'Password': 'incorrect'}))
+    MOCK.process(CollectdConfig({'Password': 'incorrect'}))
+    assert MOCK.warning.called
+    assert not MOCK.values
 
 
 def test_xmlsyntaxerror_in_read(fc_class_mock):
@@ -335,6 +1129,151 @@ def test_xmlsyntaxerror_in_read(fc_class_mock):
     MOCK.process()
 
 
+@pytest.mark.parametrize('metadata, version', [
+    (mock.Mock(version=mock.Mock(return_value='1.0')), '1.0'),
+    (mock.Mock(version=mock.Mock(side_effect=LookupError)), '2.0'),
+    (None, '2.0')])
+def test_version(mocker, metadata, version):
+    """ Test that the version is read from the package metadata and only
+        determined by pbr if there is none. """
+    if metadata is not None:
+        metadata.PackageNotFoundError = LookupError
+    mocker.patch.dict(sys.modules, {'importlib.metadata': metadata})
+    mocker.patch('pbr.version.VersionInfo').return_value.release_string \
+        .return_value = '2.0'
+    # pylint: disable=protected-access
+    assert fritzcollectd._get_version() == version
+
+
+def test_connect_in_background(fc_class_mock):
+    """ Test that the routers are connected in parallel in the background
+        and that a slow or failing router doesn't delay the others. """
+    connect_slow = threading.Event()
+
+    def connect(address, **_):
+        if address == 'failing':
+            raise IOError('unreachable')
+        if address == 'slow':
+            connect_slow.wait()
+        return FritzConnectionMock()
+    fc_class_mock.side_effect = connect
+
+    for address in ['failing', 'slow', 'fritz.box']:
+        fritzcollectd.callback_configure(CollectdConfig({
+            'Address': address, 'Instance': address}))
+    failing, slow, router = fritzcollectd.CONFIGS  # pylint: disable=W0632
+    try:
+        fritzcollectd.callback_init()
+        assert router.wait_connected(5)
+        assert not failing.wait_connected(5)
+        assert MOCK.warning.called
+        assert not slow.wait_connected(0)
+        MOCK.read()
+        assert MOCK.values
+        assert all(value.plugin_instance.startswith('fritz.box')
+                   for value in MOCK.values)
+        connect_slow.set()
+        assert slow.wait_connected(5)
+    finally:
+        connect_slow.set()
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+
+
+class SynchronousExecutor(object):
+    """ Executor stand-in that runs submitted functions immediately. """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+
+    @staticmethod
+    def submit(function, *args):
+        """ Run the function and return a finished future """
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except Exception as exception:  # pylint: disable=broad-except
+            future.set_exception(exception)
+        return future
+
+    def shutdown(self):
+        """ Nothing to shut down """
+
+
+def test_reconnect_in_background(fc_class_mock):
+    """ Test that reconnecting neither blocks reads nor the shutdown. """
+    fc_mock = fc_class_mock.return_value
+    fc_mock.call_action.side_effect = [{0}, XMLSyntaxError(0, 0, 0, 0)]
+    connecting = threading.Event()
+    connected = threading.Event()
+
+    def connect(**_):
+        connecting.set()
+        connected.wait()
+        return FritzConnectionMock()
+
+    fritzcollectd.callback_configure(CollectdConfig())
+    config = fritzcollectd.CONFIGS[0]
+    try:
+        fritzcollectd.callback_init()
+        assert config.wait_connected()
+        fc_class_mock.side_effect = connect
+        fritzcollectd.callback_read(config)
+        assert connecting.wait(5)
+
+        # The reconnect is still running, the read is skipped.
+        fritzcollectd.callback_read(config)
+        assert fc_class_mock.call_count == 2
+        assert not MOCK.values
+    finally:
+        # The hanging reconnect doesn't delay the shutdown.
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+
+    connected.set()
+    assert config.wait_connected(5)
+    fritzcollectd.callback_read(config)
+    assert MOCK.values
+
+
+def test_reconnect_backoff(fc_class_mock, mocker):
+    """ Test that failing reconnects are retried with increasing delay. """
+    mocker.patch('fritzcollectd.RECONNECTOR', SynchronousExecutor(1))
+    mocker.patch('random.uniform', return_value=1.0)
+    timer = mocker.patch('fritzcollectd.default_timer', return_value=0)
+    fc_mock = fc_class_mock.return_value
+    fc_mock.call_action.side_effect = [{0}, requests.ConnectionError()]
+
+    config = CollectdConfig({'ReconnectDelay': 10, 'ReconnectMaxDelay': 15})
+    fritzcollectd.callback_configure(config)
+    config = fritzcollectd.CONFIGS[0]
+    try:
+        fritzcollectd.callback_init()
+        fc_failure = FritzConnectionMock()
+        type(fc_failure).modelname = mock.PropertyMock(return_value=None)
+        fc_class_mock.return_value = fc_failure
+        fritzcollectd.callback_read(config)  # Fails, retry after 10s
+        assert fc_class_mock.call_count == 2
+        timer.return_value = 9
+        fritzcollectd.callback_read(config)  # Skipped
+        assert fc_class_mock.call_count == 2
+        timer.return_value = 10
+        fritzcollectd.callback_read(config)  # Fails, retry after 15s
+        assert fc_class_mock.call_count == 3
+        timer.return_value = 24
+        fritzcollectd.callback_read(config)  # Skipped
+        fc_class_mock.return_value = FritzConnectionMock()
+        timer.return_value = 25
+        fritzcollectd.callback_read(config)  # Reconnected
+        assert fc_class_mock.call_count == 4
+        assert not MOCK.values
+        fritzcollectd.callback_read(config)
+        assert MOCK.values
+    finally:
+        fritzcollectd.callback_shutdown()
+        del MOCK.read_callbacks[:]
+
+
 # System tests that try to interact with a real hardware device.
 
 @pytest.mark.skip(reason="system test")
@@ -0,0 +1,103 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Tests for the fritzcollectd host list """
+
+import io
+
+import pytest
+
+import requests
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.hosts import HostList, parse_host_list  # noqa, pylint: disable=wrong-import-order
+
+HOST_LIST = b"""<?xml version="1.0" encoding="utf-8"?>
+<List>
+  <Item>
+    <Index>1</Index>
+    <IPAddress>192.168.178.20</IPAddress>
+    <MACAddress>00:11:22:33:44:55</MACAddress>
+    <Active>1</Active>
+    <HostName>desktop</HostName>
+    <InterfaceType>Ethernet</InterfaceType>
+    <X_AVM-DE_Port>1</X_AVM-DE_Port>
+    <X_AVM-DE_Speed>1000</X_AVM-DE_Speed>
+    <X_AVM-DE_Guest>0</X_AVM-DE_Guest>
+  </Item>
+  <Item>
+    <Index>2</Index>
+    <IPAddress>192.168.179.21</IPAddress>
+    <MACAddress>00:11:22:33:44:56</MACAddress>
+    <Active>1</Active>
+    <HostName>phone</HostName>
+    <InterfaceType>802.11</InterfaceType>
+    <X_AVM-DE_Guest>1</X_AVM-DE_Guest>
+  </Item>
+  <Item>
+    <Index>3</Index>
+    <IPAddress>192.168.178.22</IPAddress>
+    <MACAddress>00:11:22:33:44:57</MACAddress>
+    <Active>1</Active>
+    <HostName>repeater</HostName>
+    <InterfaceType></InterfaceType>
+  </Item>
+  <Item>
+    <Index>4</Index>
+    <IPAddress></IPAddress>
+    <MACAddress>00:11:22:33:44:58</MACAddress>
+    <Active>0</Active>
+    <HostName>laptop</HostName>
+    <InterfaceType>802.11</InterfaceType>
+  </Item>
+</List>
+"""
+
+
+def test_parse_host_list():
+    """ Hosts are counted in total, active and per interface type. """
+    assert parse_host_list(io.BytesIO(HOST_LIST)) == {
+        'hosts': 4, 'hosts_active': 3, 'hosts_active_guest': 1,
+        'hosts_active_ethernet': 1, 'hosts_active_wlan': 1,
+        'hosts_active_unknown': 1}
+
+
+def test_statistics(mocker):
+    """ The host list is downloaded from the path on the router. """
+    get = mocker.patch('requests.Session').return_value.get
+    get.return_value.raw = io.BytesIO(HOST_LIST)
+    host_list = HostList('fritz.box', 49000, timeout=5)
+    assert host_list.statistics('/devicehostlist.lua?sid=1')['hosts'] == 4
+    get.assert_called_once_with(
+        'http://fritz.box:49000/devicehostlist.lua?sid=1', stream=True,
+        timeout=5)
+    host_list.close()
+
+
+def test_statistics_failed(mocker):
+    """ HTTP errors are raised as IOError. """
+    mocker.patch('requests.Session').return_value.get.return_value \
+        .raise_for_status.side_effect = requests.HTTPError()
+    with pytest.raises(IOError):
+        HostList('fritz.box', 49000).statistics('/devicehostlist.lua')
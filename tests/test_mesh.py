@@ -0,0 +1,75 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+
+""" Tests for the fritzcollectd mesh topology """
+
+import pytest
+
+import requests
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.mesh import MeshList, MeshNode, parse_mesh_list  # noqa, pylint: disable=wrong-import-order
+
+MESH_LIST = {
+    'schema_version': '3.2',
+    'nodes': [
+        {'device_name': 'fritz.box', 'device_mac_address': '00:11:22:33:44:50',
+         'is_meshed': True, 'mesh_role': 'master'},
+        {'device_name': 'FRITZ!Repeater 1200', 'is_meshed': True,
+         'device_mac_address': '00:11:22:33:44:57', 'mesh_role': 'slave'},
+        {'device_name': '', 'device_mac_address': '00:11:22:33:44:AB',
+         'is_meshed': True, 'mesh_role': 'slave'},
+        {'device_name': 'laptop', 'device_mac_address': '00:11:22:33:44:58',
+         'is_meshed': False, 'mesh_role': 'unknown'},
+    ]
+}
+
+
+def test_parse_mesh_list():
+    """ Only the meshed nodes besides the master are returned, their names
+        are usable as plugin instance. """
+    assert parse_mesh_list(MESH_LIST) == [
+        MeshNode('FRITZRepeater1200', '00:11:22:33:44:57'),
+        MeshNode('0011223344ab', '00:11:22:33:44:AB')]
+    assert parse_mesh_list({}) == []
+
+
+def test_nodes(mocker):
+    """ The mesh list is downloaded from the path on the router. """
+    get = mocker.patch('requests.Session').return_value.get
+    get.return_value.json.return_value = MESH_LIST
+    mesh_list = MeshList('fritz.box', 49000, timeout=5)
+    assert len(mesh_list.nodes('/meshlist.lua?sid=1')) == 2
+    get.assert_called_once_with('http://fritz.box:49000/meshlist.lua?sid=1',
+                                timeout=5)
+    mesh_list.close()
+
+
+def test_nodes_failed(mocker):
+    """ HTTP errors are raised as IOError. """
+    mocker.patch('requests.Session').return_value.get.return_value \
+        .raise_for_status.side_effect = requests.HTTPError()
+    with pytest.raises(IOError):
+        MeshList('fritz.box', 49000).nodes('/meshlist.lua')
@@ -0,0 +1,56 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Tests for the fritzcollectd online monitor history """
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.onlinemonitor import OnlineMonitor, aggregate, \
+    parse_samples  # noqa, pylint: disable=wrong-import-order
+
+
+def test_parse_samples():
+    """ Test that the comma separated samples are parsed. """
+    assert parse_samples('3,2,1') == [3, 2, 1]
+    assert parse_samples('') == []
+
+
+def test_aggregate():
+    """ Test the aggregation of the samples. """
+    assert aggregate(list(range(1, 21))) == {'min': 1, 'max': 20,
+                                             'mean': 10.5, 'p95': 19}
+    assert aggregate([7]) == {'min': 7, 'max': 7, 'mean': 7.0, 'p95': 7}
+
+
+def test_samples_overlap():
+    """ Test that overlapping histories of consecutive reads are only
+        returned once and line up with the sample interval. """
+    monitor = OnlineMonitor()
+    readings = {'Newds_current_bps': '3,2,1', 'Newus_current_bps': '6,5,4'}
+    assert monitor.samples(readings, ['Newds_current_bps'], 1002) == {
+        'Newds_current_bps': [(990, 1), (995, 2), (1000, 3)]}
+    readings = {'Newds_current_bps': '5,4,3,2,1'}
+    assert monitor.samples(readings, ['Newds_current_bps',
+                                      'Newus_current_bps'], 1011) == {
+                                          'Newds_current_bps': [(1005, 4),
+                                                                (1010, 5)]}
@@ -0,0 +1,57 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+
+""" Tests for the fritzcollectd quarantine of failing calls """
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.quarantine import Quarantine  # noqa, pylint: disable=wrong-import-order
+
+
+def test_threshold(mocker):
+    """ Calls are quarantined after failing twice in a row. """
+    mocker.patch('fritzcollectd.quarantine.default_timer', return_value=0)
+    quarantine = Quarantine(10, 100)
+    assert quarantine.failed('key') is None
+    assert not quarantine.skipped('key')
+    assert not quarantine.succeeded('key')
+    assert quarantine.failed('key') is None
+    assert quarantine.failed('key') == 10
+    assert quarantine.skipped('key')
+    assert len(quarantine) == 1
+
+
+def test_growing_delay(mocker):
+    """ The delay doubles with every failed retry up to the maximum. """
+    timer = mocker.patch('fritzcollectd.quarantine.default_timer',
+                         return_value=0)
+    quarantine = Quarantine(10, 25, threshold=1)
+    assert [quarantine.failed('key') for _ in range(3)] == [10, 20, 25]
+    timer.return_value = 24
+    assert quarantine.skipped('key')
+    assert not quarantine.skipped('other')
+    timer.return_value = 25
+    assert not quarantine.skipped('key')
+    assert quarantine.succeeded('key')
+    assert not quarantine
@@ -0,0 +1,90 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Tests for the fritzcollectd response cache """
+
+import threading
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import pytest
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.responsecache import ResponseCache  # noqa, pylint: disable=wrong-import-order
+
+
+def test_cached(mocker):
+    """ Responses are cached until the TTL expires. """
+    timer = mocker.patch('fritzcollectd.responsecache.default_timer',
+                         return_value=0)
+    call = mock.Mock(side_effect=lambda: {'NewUptime': 1})
+    cache = ResponseCache()
+    response = cache.get('key', 5, call)
+    response['NewIndex'] = 0
+    assert cache.get('key', 5, call) == {'NewUptime': 1}
+    assert call.call_count == 1
+    timer.return_value = 5
+    cache.get('other', 5, call)
+    cache.get('key', 5, call)
+    assert call.call_count == 3
+    cache.clear()
+    cache.get('key', 5, call)
+    assert call.call_count == 4
+
+
+def test_failure_not_cached():
+    """ Failed calls are raised and called again. """
+    call = mock.Mock(side_effect=[IOError(), {}])
+    cache = ResponseCache()
+    with pytest.raises(IOError):
+        cache.get('key', 5, call)
+    assert cache.get('key', 5, call) == {}
+
+
+def test_call_in_flight():
+    """ Concurrent callers wait for the call in flight. """
+    calling = threading.Event()
+    finish = threading.Event()
+
+    def call():
+        calling.set()
+        finish.wait(5)
+        return {'NewUptime': 1}
+
+    cache = ResponseCache()
+    responses = []
+    thread = threading.Thread(
+        target=lambda: responses.append(cache.get('key', 5, call)))
+    thread.start()
+    assert calling.wait(5)
+    waiting = threading.Thread(target=lambda: responses.append(
+        cache.get('key', 5, mock.Mock(side_effect=AssertionError()))))
+    waiting.start()
+    finish.set()
+    thread.join(5)
+    waiting.join(5)
+    assert responses == [{'NewUptime': 1}] * 2
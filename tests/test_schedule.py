@@ -0,0 +1,57 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+
+""" Tests for the fritzcollectd adaptive read interval """
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.schedule import AdaptiveSchedule  # noqa, pylint: disable=wrong-import-order
+
+
+def test_interval():
+    """ The interval doubles while the activity is flat and drops to the
+        minimum if an activity value changes by more than the threshold. """
+    schedule = AdaptiveSchedule(10, 60, 0.1)
+    intervals = []
+    for power in [100, 100, 105, 100, 100, 200, 200]:
+        schedule.update({('dect0', 'power'): ('power', power),
+                         ('dect0', 'energy'): ('power', power * 10),
+                         ('', 'receiverate'): ('bitrate', 0),
+                         ('', 'if_octets'): ('if_octets', (1, 2))})
+        intervals.append(schedule.interval)
+    assert intervals == [20, 40, 60, 60, 60, 10, 20]
+
+
+def test_due(mocker):
+    """ Reads are due once the interval has passed (with a tolerance of
+        half the minimal interval for late and early callbacks). """
+    timer = mocker.patch('fritzcollectd.schedule.default_timer',
+                         return_value=0)
+    schedule = AdaptiveSchedule(10, 60, 0.1)
+    assert schedule.due()
+    schedule.update({})
+    timer.return_value = 14
+    assert not schedule.due()
+    timer.return_value = 15
+    assert schedule.due()
@@ -0,0 +1,207 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Tests for the fritzcollectd persistent SOAP session """
+
+import hashlib
+import re
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+import fritzconnection
+import pytest
+import requests
+
+from fritzconnection.fritzconnection import (FritzAction,
+                                             FritzActionArgument,
+                                             FritzService)
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.session import SoapSession  # noqa, pylint: disable=wrong-import-order
+from fritzcollectd.statistics import ReadStatistics  # noqa, pylint: disable=wrong-import-order
+
+USER = 'user'
+PASSWORD = 'password'
+REALM = 'HTTPS Access'
+RESPONSE = b"""<?xml version="1.0"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+<s:Body><u:GetInfoResponse xmlns:u="urn:dslforum-org:service:DeviceInfo:1">
+<NewUpTime>42</NewUpTime>
+</u:GetInfoResponse></s:Body></s:Envelope>"""
+
+
+def _md5(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+class DigestHandler(BaseHTTPRequestHandler):
+    """ TR-064 control URL protected by HTTP digest authentication that
+        supports persistent connections. """
+
+    protocol_version = 'HTTP/1.1'
+    nonce = '0123456789ABCDEF'
+    stats = {'connections': 0, 'challenges': 0}
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.stats['connections'] += 1
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ Answer SOAP requests """
+        self.rfile.read(int(self.headers['Content-Length']))
+        if not self._authorized():
+            self.stats['challenges'] += 1
+            self.send_response(401)
+            self.send_header('WWW-Authenticate',
+                             'Digest realm="{}", nonce="{}", algorithm=MD5, '
+                             'qop="auth"'.format(REALM, self.nonce))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def _authorized(self):
+        fields = dict(re.findall(r'(\w+)="?([^",]*)"?',
+                                 self.headers.get('Authorization', '')))
+        if fields.get('nonce') != self.nonce:
+            return False
+        ha1 = _md5('{}:{}:{}'.format(USER, REALM, PASSWORD))
+        ha2 = _md5('POST:{}'.format(fields['uri']))
+        return fields['response'] == _md5('{}:{}:{}:{}:auth:{}'.format(
+            ha1, self.nonce, fields['nc'], fields['cnonce'], ha2))
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """ HTTP server that handles every connection in its own thread """
+    daemon_threads = True
+
+
+# pylint: disable=redefined-outer-name
+
+@pytest.fixture()
+def server():
+    """ Fixture that runs the HTTP server in a background thread. """
+    DigestHandler.stats = {'connections': 0, 'challenges': 0}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), DigestHandler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def _connection(port, password=PASSWORD):
+    """ FritzConnection stand-in with a single service and action """
+    service = FritzService('urn:dslforum-org:service:DeviceInfo:1',
+                           'urn:DeviceInfo-com:serviceId:DeviceInfo1',
+                           '/upnp/control/deviceinfo', '/deviceinfoSCPD.xml')
+    action = FritzAction(service.service_type, service.control_url,
+                         {'address': '127.0.0.1', 'port': port,
+                          'user': USER, 'password': password})
+    action.name = 'GetInfo'
+    argument = FritzActionArgument()
+    argument.name = 'NewUpTime'
+    argument.data_type = 'ui4'
+    action.arguments = {argument.name: argument}
+    service.actions = {action.name: action}
+    return mock.Mock(services={'DeviceInfo:1': service})
+
+
+def test_keep_alive(server):
+    """ All calls share one connection and one digest challenge. """
+    connection = _connection(server.server_port)
+    session = SoapSession(USER, PASSWORD)
+    session.attach(connection)
+    action = connection.services['DeviceInfo:1'].actions['GetInfo']
+    for _ in range(3):
+        assert action.execute() == {'NewUpTime': 42}
+    session.close()
+    assert DigestHandler.stats == {'connections': 1, 'challenges': 1}
+
+
+def test_stale_nonce(server):
+    """ A new challenge is answered when the router changes the nonce. """
+    connection = _connection(server.server_port)
+    session = SoapSession(USER, PASSWORD)
+    session.attach(connection)
+    action = connection.services['DeviceInfo:1'].actions['GetInfo']
+    assert action.execute() == {'NewUpTime': 42}
+    DigestHandler.nonce = 'FEDCBA9876543210'
+    assert action.execute() == {'NewUpTime': 42}
+    session.close()
+    assert DigestHandler.stats['challenges'] == 2
+
+
+def test_incorrect_password(server):
+    """ Incorrect passwords are reported like FritzAction does. """
+    connection = _connection(server.server_port, password='incorrect')
+    session = SoapSession(USER, 'incorrect')
+    session.attach(connection)
+    action = connection.services['DeviceInfo:1'].actions['GetInfo']
+    with pytest.raises(fritzconnection.AuthorizationError):
+        action.execute()
+    session.close()
+
+
+def test_connection_closed(mocker):
+    """ Requests are sent again if the router closed the connection. """
+    post = mocker.patch('requests.Session.post')
+    post.side_effect = [requests.ConnectionError(),
+                        mock.Mock(status_code=200, content=RESPONSE)]
+    connection = _connection(49000)
+    SoapSession(USER, '').attach(connection)
+    action = connection.services['DeviceInfo:1'].actions['GetInfo']
+    assert action.execute() == {'NewUpTime': 42}
+    assert post.call_count == 2
+
+
+def test_statistics(mocker):
+    """ Size and parse time of the responses are recorded. """
+    mocker.patch('requests.Session.post').return_value = mock.Mock(
+        status_code=200, content=RESPONSE)
+    connection = _connection(49000)
+    session = SoapSession(USER, '')
+    session.statistics = ReadStatistics()
+    session.attach(connection)
+    connection.services['DeviceInfo:1'].actions['GetInfo'].execute()
+    assert session.statistics.bytes_received == len(RESPONSE)
+    assert session.statistics.parse_time > 0
@@ -0,0 +1,76 @@
+# fritzcollectd - FRITZ!Box collectd plugin
+# Copyright (c) 2014-2019 Christian Fetzer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# pylint: disable=bad-option-value,useless-object-inheritance
+
+""" Tests for the fritzcollectd worker pool """
+
+import threading
+
+import pytest
+
+# Importing the plugin tests installs the collectd mock.
+from tests.test_fritzcollectd import MOCK  # noqa, pylint: disable=unused-import
+from fritzcollectd.workerpool import WorkerPool  # noqa, pylint: disable=wrong-import-order
+
+
+def test_bounded():
+    """ No more than the given number of functions run at a time, the
+        threads end once the queue is empty. """
+    release = threading.Event()
+    running = []
+    lock = threading.Lock()
+
+    def work(value):
+        with lock:
+            running.append(threading.current_thread())
+        release.wait(5)
+        return value
+
+    pool = WorkerPool(2)
+    futures = [pool.submit(work, value) for value in range(5)]
+    release.set()
+    assert [future.result(5) for future in futures] == list(range(5))
+    assert len(set(running)) <= 2
+    assert all(thread.daemon for thread in running)
+    for thread in running:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in running)
+
+
+def test_failure_and_cancel():
+    """ Exceptions are set on the future, cancelled calls are skipped. """
+    release = threading.Event()
+    calls = []
+
+    def fail():
+        release.wait(5)
+        raise ValueError()
+
+    pool = WorkerPool(1)
+    failing = pool.submit(fail)
+    cancelled = pool.submit(calls.append, 1)
+    assert cancelled.cancel()
+    release.set()
+    with pytest.raises(ValueError):
+        failing.result(5)
+    assert pool.submit(calls.append, 2).result(5) is None
+    assert calls == [2]